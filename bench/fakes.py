@@ -0,0 +1,82 @@
+import asyncio
+import itertools
+import json
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Any, List, Tuple, Dict
+
+from telegram.request import BaseRequest, RequestData
+
+BOT_USER = {"id": 1, "is_bot": True, "first_name": "Bench", "username": "bench_bot"}
+MESSAGE_METHODS = {"sendMessage", "forwardMessage", "editMessageText", "editMessageReplyMarkup", "sendPhoto"}
+
+
+class FakeBot:
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.sent: List[Tuple[int, str]] = []
+
+    async def send_message(self, chat_id: int, text: str, **kwargs) -> None:
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        self.sent.append((chat_id, text))
+
+
+@dataclass
+class FakeJob:
+    name: str
+    user_id: int | None = None
+    data: Any = None
+
+
+@dataclass
+class FakeJobQueue:
+    jobs: List[FakeJob] = field(default_factory=list)
+
+    def run_repeating(self, callback, interval, first=None, name=None, user_id=None, data=None, **kwargs) -> FakeJob:
+        job = FakeJob(name, user_id, data)
+        self.jobs.append(job)
+        return job
+
+    def run_once(self, callback, when, name=None, user_id=None, data=None, **kwargs) -> FakeJob:
+        job = FakeJob(name, user_id, data)
+        self.jobs.append(job)
+        return job
+
+
+class FakeRequest(BaseRequest):
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.calls: Counter = Counter()
+        self._message_ids = itertools.count(1)
+
+    @property
+    def read_timeout(self) -> float | None:
+        return None
+
+    async def initialize(self) -> None:
+        pass
+
+    async def shutdown(self) -> None:
+        pass
+
+    def message(self, parameters: Dict[str, Any]) -> Dict[str, Any]:
+        chat_id = parameters.get("chat_id", 0)
+        return {"message_id": parameters.get("message_id") or next(self._message_ids), "date": int(time.time()),
+                "chat": {"id": chat_id, "type": "private"}, "from": BOT_USER, "text": parameters.get("text", "")}
+
+    async def do_request(self, url: str, method: str, request_data: RequestData | None = None, read_timeout=None,
+                         write_timeout=None, connect_timeout=None, pool_timeout=None) -> Tuple[int, bytes]:
+        endpoint = url.rsplit("/", 1)[-1]
+        self.calls[endpoint] += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        parameters = request_data.parameters if request_data is not None else dict()
+        if endpoint == "getMe":
+            result = BOT_USER
+        elif endpoint in MESSAGE_METHODS:
+            result = self.message(parameters)
+        else:
+            result = True
+        return 200, json.dumps({"ok": True, "result": result}).encode()
@@ -0,0 +1,199 @@
+import argparse
+import asyncio
+import itertools
+import json
+import logging
+import time
+from collections import defaultdict
+from pathlib import Path
+from typing import Dict, List, Any, Callable, Tuple
+
+from telegram import Update, Bot
+
+from bench.fakes import FakeRequest
+from bench.run import prepare_workdir, percentile
+from bench.stub_server import ListingStub, StubServer
+
+ADMIN_ID = 1
+
+
+class UpdateFactory:
+    def __init__(self, bot: Bot):
+        self.bot = bot
+        self._update_ids = itertools.count(1)
+        self._message_ids = itertools.count(1)
+
+    def message(self, user_id: int, text: str, entities: List[Dict[str, Any]] | None = None) -> Update:
+        return Update.de_json({
+            "update_id": next(self._update_ids),
+            "message": {
+                "message_id": next(self._message_ids),
+                "date": int(time.time()),
+                "chat": {"id": user_id, "type": "private"},
+                "from": {"id": user_id, "is_bot": False, "first_name": f"user{user_id}"},
+                "text": text,
+                "entities": entities or [],
+            },
+        }, self.bot)
+
+    def command(self, user_id: int, command: str) -> Update:
+        return self.message(user_id, command, [{"type": "bot_command", "offset": 0, "length": len(command)}])
+
+    def url(self, user_id: int, url: str) -> Update:
+        return self.message(user_id, url, [{"type": "url", "offset": 0, "length": len(url)}])
+
+    def callback(self, user_id: int, data: str) -> Update:
+        return Update.de_json({
+            "update_id": next(self._update_ids),
+            "callback_query": {
+                "id": str(next(self._update_ids)),
+                "chat_instance": str(user_id),
+                "from": {"id": user_id, "is_bot": False, "first_name": f"user{user_id}"},
+                "data": data,
+                "message": {
+                    "message_id": next(self._message_ids),
+                    "date": int(time.time()),
+                    "chat": {"id": user_id, "type": "private"},
+                    "from": {"id": self.bot.id, "is_bot": True, "first_name": "Bench"},
+                    "text": "menu",
+                },
+            },
+        }, self.bot)
+
+
+def user_script(factory: UpdateFactory, user_id: int, url: str) -> List[Tuple[str, Callable[[], Update]]]:
+    return [
+        ("start", lambda: factory.command(user_id, "/start")),
+        ("account", lambda: factory.message(user_id, "Аккаунт")),
+        ("tasks", lambda: factory.message(user_id, "Задачи")),
+        ("task_create", lambda: factory.callback(user_id, "tsk_crt")),
+        ("task_url", lambda: factory.url(user_id, url)),
+        ("task_frequency", lambda: factory.message(user_id, "3 минуты")),
+        ("task_name", lambda: factory.message(user_id, f"task of {user_id}")),
+        ("tasks", lambda: factory.message(user_id, "Задачи")),
+        ("task_list", lambda: factory.callback(user_id, "tsk_inf")),
+        ("renew", lambda: factory.message(user_id, "Продлить подписку")),
+        ("pay_window", lambda: factory.message(user_id, "7 дней")),
+        ("cancel", lambda: factory.message(user_id, "Отмена")),
+        ("payment_approve", lambda: factory.callback(ADMIN_ID, f"pmt_apr_{user_id};{user_id};7")),
+        ("guide", lambda: factory.message(user_id, "Инструкция")),
+    ]
+
+
+class StallMonitor:
+    def __init__(self, interval: float = 0.01):
+        self.interval = interval
+        self.stalls: List[float] = []
+        self._task: asyncio.Task | None = None
+
+    async def _watch(self) -> None:
+        while True:
+            start = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            self.stalls.append(max(time.perf_counter() - start - self.interval, 0.0))
+
+    def __enter__(self) -> "StallMonitor":
+        self._task = asyncio.create_task(self._watch())
+        return self
+
+    def __exit__(self, *args) -> None:
+        self._task.cancel()
+
+
+async def run(args: argparse.Namespace) -> Dict[str, Any]:
+    workdir = prepare_workdir()
+    import main
+    from src.fetcher import Fetcher
+
+    for name in ("bot", "store_keeper"):
+        logging.getLogger(name).setLevel(logging.WARNING)
+    request = FakeRequest(args.bot_latency)
+    latencies: Dict[str, List[float]] = defaultdict(list)
+    errors = 0
+    with StubServer(ListingStub(pages=args.pages)) as server:
+        application = main.build_application("0:load", request, db_file=workdir / "res/db/load.sqlite",
+                                             fetcher=Fetcher(proxy=server.proxy_url, rate_limit=args.rate_limit))
+        factory = UpdateFactory(application.bot)
+        users = asyncio.Semaphore(args.concurrency)
+
+        async def simulate(user_id: int) -> None:
+            nonlocal errors
+            url = f"http://bina.az/category-{user_id % args.categories}/menziller"
+            async with users:
+                for _ in range(args.rounds):
+                    for kind, make_update in user_script(factory, user_id, url):
+                        update = make_update()
+                        start = time.perf_counter()
+                        try:
+                            await application.process_update(update)
+                        except Exception as e:
+                            errors += 1
+                            logging.getLogger("bot").error("Update failed", exc_info=e)
+                        latencies[kind].append(time.perf_counter() - start)
+
+        async with application:
+            if args.jobs:
+                await application.start()
+            try:
+                with StallMonitor() as monitor:
+                    start = time.perf_counter()
+                    await asyncio.gather(*(simulate(user_id) for user_id in range(ADMIN_ID + 1,
+                                                                                    ADMIN_ID + 1 + args.users)))
+                    wall = time.perf_counter() - start
+            finally:
+                if args.jobs:
+                    await application.stop()
+                await main.store_keeper.close()
+    samples = [value for values in latencies.values() for value in values]
+    return {
+        "users": args.users,
+        "concurrency": args.concurrency,
+        "updates": len(samples),
+        "errors": errors,
+        "wall_s": wall,
+        "updates_per_s": len(samples) / wall if wall else 0.0,
+        "p50_ms": percentile(samples, 50) * 1000,
+        "p99_ms": percentile(samples, 99) * 1000,
+        "stall_max_ms": max(monitor.stalls, default=0.0) * 1000,
+        "stall_total_ms": sum(monitor.stalls) * 1000,
+        "api_calls": dict(request.calls),
+        "handlers": {
+            kind: {"count": len(values),
+                   "p50_ms": percentile(values, 50) * 1000,
+                   "p99_ms": percentile(values, 99) * 1000}
+            for kind, values in latencies.items()
+        },
+    }
+
+
+def print_report(result: Dict[str, Any]) -> None:
+    print(f"\n== {result['users']} users / concurrency {result['concurrency']} ==")
+    print(f"wall {result['wall_s']:.3f}s  updates {result['updates']} ({result['updates_per_s']:.1f}/s)  "
+          f"errors {result['errors']}  p50 {result['p50_ms']:.2f} ms  p99 {result['p99_ms']:.2f} ms")
+    print(f"event loop stall: max {result['stall_max_ms']:.2f} ms, total {result['stall_total_ms']:.1f} ms")
+    print(f"{'update':<20}{'count':>8}{'p50 ms':>10}{'p99 ms':>10}")
+    for kind, stats in result["handlers"].items():
+        print(f"{kind:<20}{stats['count']:>8}{stats['p50_ms']:>10.2f}{stats['p99_ms']:>10.2f}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Replay synthetic Telegram updates through the bot handlers")
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=50, help="users sending updates at the same time")
+    parser.add_argument("--rounds", type=int, default=1, help="times each user repeats the scenario")
+    parser.add_argument("--categories", type=int, default=20, help="distinct listing URLs used by the users")
+    parser.add_argument("--pages", type=int, default=5, help="listing pages served per category")
+    parser.add_argument("--bot-latency", type=float, default=0.0, help="simulated Telegram API latency, seconds")
+    parser.add_argument("--rate-limit", type=float, default=0, help="requests per second to the stub, 0 = unlimited")
+    parser.add_argument("--jobs", action="store_true", help="also run the job queue (polling, outbox) during the test")
+    parser.add_argument("--output", type=Path, default=None, help="write results as JSON")
+    args = parser.parse_args()
+    output = args.output.resolve() if args.output else None
+    result = asyncio.run(run(args))
+    print_report(result)
+    if output:
+        output.write_text(json.dumps(result, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,217 @@
+import argparse
+import asyncio
+import json
+import logging
+import os
+import resource
+import sys
+import tempfile
+import time
+import tracemalloc
+from collections import defaultdict
+from functools import wraps
+from pathlib import Path
+from typing import Dict, List, Callable, Any
+
+from bench.fakes import FakeBot, FakeJobQueue
+from bench.stub_server import ListingStub, StubServer
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+class StageTimer:
+    def __init__(self):
+        self.samples: Dict[str, List[float]] = defaultdict(list)
+        self.counters: Dict[str, int] = defaultdict(int)
+
+    def wrap(self, stage: str, func: Callable, count: Callable[[Any], int] | None = None) -> Callable:
+        if asyncio.iscoroutinefunction(func):
+            @wraps(func)
+            async def timed(*args, **kwargs):
+                start = time.perf_counter()
+                result = await func(*args, **kwargs)
+                self.samples[stage].append(time.perf_counter() - start)
+                if count is not None:
+                    self.counters[stage] += count(result)
+                return result
+        else:
+            @wraps(func)
+            def timed(*args, **kwargs):
+                start = time.perf_counter()
+                result = func(*args, **kwargs)
+                self.samples[stage].append(time.perf_counter() - start)
+                if count is not None:
+                    self.counters[stage] += count(result)
+                return result
+        return timed
+
+    def reset(self) -> None:
+        self.samples.clear()
+        self.counters.clear()
+
+
+def percentile(values: List[float], q: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    index = min(len(values) - 1, max(0, round(q / 100 * (len(values) - 1))))
+    return values[index]
+
+
+def prepare_workdir() -> Path:
+    workdir = Path(tempfile.mkdtemp(prefix="bina_bench_"))
+    (workdir / "res/db").mkdir(parents=True)
+    (workdir / "res/important_data.key").write_text("0000000000000000;0")
+    (workdir / "res/telegram.key").write_text("0:bench")
+    (workdir / "res/telegram_second.key").write_text("0:bench")
+    os.chdir(workdir)
+    sys.path.insert(0, str(ROOT))
+    return workdir
+
+
+def clear_tables() -> None:
+    from src import db_session
+    from src.db_session import SqlAlchemyBase
+
+    session = db_session.create_session()
+    for table in reversed(SqlAlchemyBase.metadata.sorted_tables):
+        session.execute(table.delete())
+    session.commit()
+    session.close()
+
+
+def age_pages(page_cache) -> None:
+    for url, (_, items) in page_cache._entries.items():
+        page_cache._entries[url] = (float("-inf"), items)
+
+
+async def run_scenario(main, store_keeper, stub: ListingStub, timer: StageTimer, args: argparse.Namespace,
+                       number_of_tasks: int) -> Dict[str, Any]:
+    from src.notifier import Notifier
+    from src.page_cache import PageCache
+
+    clear_tables()
+    store_keeper.load_cache()
+    store_keeper.page_cache = PageCache(store_keeper.page_cache.ttl, store_keeper.page_cache.max_size)
+    categories = min(args.categories, number_of_tasks)
+    jobs = []
+    for i in range(number_of_tasks):
+        user_id = i + 1
+        store_keeper.new_user(user_id)
+        url = f"http://bina.az/category-{i % categories}/menziller"
+        task_id = await store_keeper.add_task(user_id, f"task {i}", url, 3)
+        jobs.append(store_keeper.make_poll_job(store_keeper.get_task(task_id)))
+    bot = FakeBot(args.bot_latency)
+    bot.send_message = timer.wrap("send", bot.send_message)
+    main.notifier = Notifier(bot, store_keeper)
+    timer.reset()
+    requests_before = stub.requests
+    if args.tracemalloc:
+        tracemalloc.start()
+    wall = 0.0
+    for _ in range(args.ticks):
+        stub.advance(args.new_per_tick)
+        age_pages(store_keeper.page_cache)
+        start = time.perf_counter()
+        await asyncio.gather(*(timer.wrap("job", main.notification)(job) for job in jobs))
+        while store_keeper.get_pending_notifications(int(time.time()), 1):
+            await timer.wrap("flush", main.notifier.flush)()
+        wall += time.perf_counter() - start
+    if args.tracemalloc:
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        peak_mb = peak / 2 ** 20
+    else:
+        peak_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    return {
+        "tasks": number_of_tasks,
+        "categories": categories,
+        "ticks": args.ticks,
+        "wall_s": wall,
+        "requests": stub.requests - requests_before,
+        "pages": timer.counters["fetch"],
+        "pages_per_s": timer.counters["fetch"] / wall if wall else 0.0,
+        "items": timer.counters["parse"],
+        "items_per_s": timer.counters["parse"] / wall if wall else 0.0,
+        "messages": len(bot.sent),
+        "peak_memory_mb": peak_mb,
+        "peak_memory_source": "tracemalloc" if args.tracemalloc else "ru_maxrss",
+        "stages": {
+            stage: {"count": len(values),
+                    "p50_ms": percentile(values, 50) * 1000,
+                    "p90_ms": percentile(values, 90) * 1000,
+                    "p99_ms": percentile(values, 99) * 1000}
+            for stage, values in timer.samples.items()
+        },
+    }
+
+
+def print_report(result: Dict[str, Any]) -> None:
+    print(f"\n== {result['tasks']} tasks / {result['categories']} categories / {result['ticks']} ticks ==")
+    print(f"wall {result['wall_s']:.3f}s  pages {result['pages']} ({result['pages_per_s']:.1f}/s)  "
+          f"items {result['items']} ({result['items_per_s']:.1f}/s)  messages {result['messages']}  "
+          f"peak memory {result['peak_memory_mb']:.1f} MB ({result['peak_memory_source']})")
+    print(f"{'stage':<10}{'count':>8}{'p50 ms':>10}{'p90 ms':>10}{'p99 ms':>10}")
+    for stage, stats in result["stages"].items():
+        print(f"{stage:<10}{stats['count']:>8}{stats['p50_ms']:>10.2f}{stats['p90_ms']:>10.2f}{stats['p99_ms']:>10.2f}")
+
+
+async def run(args: argparse.Namespace) -> List[Dict[str, Any]]:
+    workdir = prepare_workdir()
+    import main
+    from src.fetcher import Fetcher
+    from src.store_keeper import StoreKeeper
+
+    for name in ("bot", "store_keeper"):
+        logging.getLogger(name).setLevel(logging.WARNING)
+    stub = ListingStub(pages=args.pages)
+    results = []
+    with StubServer(stub) as server:
+        store_keeper = StoreKeeper(FakeJobQueue(), main.notification, main.subscription_end,
+                                   db_file=workdir / "res/db/bench.sqlite",
+                                   fetcher=Fetcher(proxy=server.proxy_url, rate_limit=args.rate_limit))
+        if args.extractor:
+            from src.extractors import get_extractor
+            store_keeper.extract_items = get_extractor(args.extractor)
+        if args.parse_workers:
+            from concurrent.futures import ProcessPoolExecutor
+            store_keeper.parse_pool = ProcessPoolExecutor(args.parse_workers)
+        timer = StageTimer()
+        store_keeper.fetcher.get = timer.wrap("fetch", store_keeper.fetcher.get, lambda _: 1)
+        store_keeper.parse_items = timer.wrap("parse", store_keeper.parse_items, len)
+        store_keeper.get_seen_item_ids = timer.wrap("diff", store_keeper.get_seen_item_ids)
+        store_keeper.record_new_items = timer.wrap("record", store_keeper.record_new_items)
+        main.store_keeper = store_keeper
+        try:
+            for number_of_tasks in args.tasks:
+                result = await run_scenario(main, store_keeper, stub, timer, args, number_of_tasks)
+                print_report(result)
+                results.append(result)
+        finally:
+            await store_keeper.close()
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Offline benchmark of the fetch/parse/diff/notify pipeline")
+    parser.add_argument("--tasks", type=int, nargs="+", default=[1, 100, 1000])
+    parser.add_argument("--categories", type=int, default=50, help="distinct listing URLs shared by the tasks")
+    parser.add_argument("--ticks", type=int, default=3)
+    parser.add_argument("--new-per-tick", type=int, default=2, help="new listings published between ticks")
+    parser.add_argument("--pages", type=int, default=5, help="listing pages served per category")
+    parser.add_argument("--bot-latency", type=float, default=0.0, help="simulated Telegram send latency, seconds")
+    parser.add_argument("--extractor", default=None, help="override config.html_extractor")
+    parser.add_argument("--parse-workers", type=int, default=0, help="override config.parse_workers")
+    parser.add_argument("--rate-limit", type=float, default=0, help="requests per second to the stub, 0 = unlimited")
+    parser.add_argument("--tracemalloc", action="store_true",
+                        help="report the per-scenario tracemalloc peak instead of process max RSS (slows the run)")
+    parser.add_argument("--output", type=Path, default=None, help="write results as JSON")
+    args = parser.parse_args()
+    output = args.output.resolve() if args.output else None
+    results = asyncio.run(run(args))
+    if output:
+        output.write_text(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+import multiprocessing
+import re
+from functools import lru_cache
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import urlsplit, parse_qs
+
+FIXTURES = Path(__file__).resolve().parent / "fixtures"
+CARD_PATTERN = re.compile(r' {6}<div class="items-i.*?\n {6}</div>\n', re.S)
+ID_PATTERN = re.compile(r'href="/items/(\d+)"')
+
+
+class ListingStub:
+    def __init__(self, fixture: Path = FIXTURES / "listing.html", pages: int = 5, first_id: int = 4_000_000):
+        text = fixture.read_text(encoding="utf-8")
+        cards = list(CARD_PATTERN.finditer(text))
+        self.head = text[:cards[0].start()]
+        self.tail = text[cards[-1].end():]
+        self.vip_cards = [card.group() for card in cards if 'vipped' in card.group()]
+        self.cards = [(card.group(), ID_PATTERN.search(card.group()).group(1))
+                      for card in cards if 'vipped' not in card.group()]
+        self.pages = pages
+        self.first_id = first_id
+        self._generation = multiprocessing.Value("q", 0)
+        self._requests = multiprocessing.Value("q", 0)
+
+    @property
+    def generation(self) -> int:
+        return self._generation.value
+
+    @property
+    def requests(self) -> int:
+        return self._requests.value
+
+    def advance(self, new_items: int) -> None:
+        with self._generation.get_lock():
+            self._generation.value += new_items
+
+    def count_request(self) -> None:
+        with self._requests.get_lock():
+            self._requests.value += 1
+
+    def etag(self, page: int) -> str:
+        return f'"{page}-{self.generation if page <= self.pages else 0}"'
+
+    def render(self, page: int) -> str:
+        return self._render(page, self.generation)
+
+    @lru_cache(maxsize=256)
+    def _render(self, page: int, generation: int) -> str:
+        if page > self.pages:
+            return self.head + ''.join(self.vip_cards) + self.tail
+        newest = self.first_id + generation
+        offset = (page - 1) * len(self.cards)
+        cards = [card.replace(old_id, str(newest - offset - i)) for i, (card, old_id) in enumerate(self.cards)]
+        return self.head + ''.join(self.vip_cards + cards) + self.tail
+
+
+class StubServer:
+    def __init__(self, stub: ListingStub, host: str = "127.0.0.1", port: int = 0):
+        self.stub = stub
+        self.host = host
+        self.port = port
+        self._ready = multiprocessing.Queue()
+        self._process = multiprocessing.Process(target=_serve, args=(stub, host, port, self._ready), daemon=True)
+
+    @property
+    def proxy_url(self) -> str:
+        return f"http://{self.host}:{self.port}"
+
+    def __enter__(self) -> "StubServer":
+        self._process.start()
+        self.port = self._ready.get(timeout=30)
+        return self
+
+    def __exit__(self, *args) -> None:
+        self._process.terminate()
+        self._process.join()
+
+
+def _serve(stub: ListingStub, host: str, port: int, ready: multiprocessing.Queue) -> None:
+    handler = type("Handler", (_ListingHandler,), {"stub": stub})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    ready.put(server.server_address[1])
+    server.serve_forever()
+
+
+class _ListingHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+    stub: ListingStub
+
+    def do_GET(self) -> None:
+        self.stub.count_request()
+        query = parse_qs(urlsplit(self.path).query)
+        try:
+            page = int(query.get("page", ["1"])[0])
+        except ValueError:
+            page = 1
+        etag = self.stub.etag(page)
+        if self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        body = self.stub.render(page).encode("utf-8")
+        self.send_response(200)
+        self.send_header("ETag", etag)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format: str, *args) -> None:
+        pass
@@ -1,15 +1,23 @@
+import argparse
+import asyncio
 import logging.config
+import signal
 from datetime import datetime
-from typing import Dict, Any
+from typing import Dict, Any, List
 
 from telegram import Update, ReplyKeyboardMarkup, InlineKeyboardButton, InlineKeyboardMarkup, MessageEntity, Bot, \
     CallbackQuery
-from telegram.ext import ApplicationBuilder, ConversationHandler, CommandHandler, ContextTypes, MessageHandler, filters, \
-    CallbackQueryHandler
+from telegram.ext import Application, ApplicationBuilder, ConversationHandler, CommandHandler, ContextTypes, \
+    MessageHandler, filters, CallbackQueryHandler
+from telegram.request import BaseRequest
 
 from src.config import telegram_key, bot_name, support_name, price, card_number, admin_chat_id, telegram_second_key, \
-    LOGGER_CONFIG
+    LOGGER_CONFIG, outbox_interval, metrics_port, metrics_host, poller_shards, tasks_page_size
+from src import metrics
 from src.dialog_lines import DialogLines, DefaultKeyboard
+from src.items import Item
+from src.notifier import Notifier
+from src.poll_scheduler import PollJob
 from src.store_keeper import StoreKeeper
 
 MAIN_MENU, RENEW_SUB, PAYMENT, SET_TASK_FREQUENCY, SET_TASK_NAME = range(5)
@@ -31,7 +39,6 @@ async def start(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     user_id = update.message.from_user.id
     try:
         till_time = store_keeper.new_user(user_id)
-        context.job_queue.run_once(subscription_end, till_time - datetime.now(), name=f"sub{user_id}", user_id=user_id)
     except KeyError:
         return await main_menu(update, context)
     await send_default_message(update, DialogLines.start, {"datetime": till_time.strftime("%d.%m.%Y %H:%M:%S")})
@@ -54,7 +61,7 @@ async def account(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     args = {
         "user_id": user_id,
         "datetime": till_time.strftime("%d.%m.%Y %H:%M:%S"),
-        "tasks": len(store_keeper.get_tasks(user_id))
+        "tasks": store_keeper.count_tasks(user_id)
     }
     await send_default_message(update, DialogLines.account, args)
     return MAIN_MENU
@@ -82,12 +89,8 @@ async def pay_window(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     return PAYMENT
 
 
-async def subscription_end(context: ContextTypes.DEFAULT_TYPE) -> None:
-    user_id = context.job.user_id
-    tasks = store_keeper.get_tasks(user_id)
-    for task in tasks:
-        context.job_queue.get_jobs_by_name(str(task.id))[0].schedule_removal()
-    await context.bot.send_message(user_id, "❌Срок вашей подписки истек!")
+async def subscription_end(user_ids: List[int]) -> None:
+    store_keeper.enqueue_service_messages(user_ids, DialogLines.subscription_end.value.text)
 
 
 async def main_menu(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
@@ -117,21 +120,22 @@ async def payment_processing(update: Update, context: ContextTypes.DEFAULT_TYPE)
 
 
 async def list_tasks(user_id: int, query: CallbackQuery, func: str, page: int = 0) -> None:
-    tasks = store_keeper.get_tasks(user_id)
-    if len(tasks) > 5:
-        keyboard = [[InlineKeyboardButton(f"<{task.name}>", callback_data=f"tsk_{func}_{task.id}")]
-                    for task in tasks[page * 5: (page + 1) * 5]]
+    count = store_keeper.count_tasks(user_id)
+    if count > tasks_page_size:
+        pages = (count - 1) // tasks_page_size + 1
+        page = min(page, pages - 1)
+        keyboard = [[InlineKeyboardButton(f"<{name}>", callback_data=f"tsk_{func}_{task_id}")]
+                    for task_id, name in store_keeper.get_task_page(user_id, page, tasks_page_size)]
         page_nav = []
         if page > 0:
             page_nav.append(InlineKeyboardButton("<<", callback_data=f"tsk_{func}_p{page - 1}"))
-        if page < (len(tasks) - 1) // 5:
+        if page < pages - 1:
             page_nav.append(InlineKeyboardButton(">>", callback_data=f"tsk_{func}_p{page + 1}"))
         keyboard = InlineKeyboardMarkup(keyboard + [page_nav])
-        await query.edit_message_text(f"Список задач\nСтраница {page + 1} из {(len(tasks) - 1) // 5 + 1}")
+        await query.edit_message_text(f"Список задач\nСтраница {page + 1} из {pages}")
     else:
-        keyboard = InlineKeyboardMarkup([[InlineKeyboardButton(f"<{task.name}>",
-                                                               callback_data=f"tsk_{func}_{task.id}")]
-                                         for task in tasks])
+        keyboard = InlineKeyboardMarkup([[InlineKeyboardButton(f"<{name}>", callback_data=f"tsk_{func}_{task_id}")]
+                                         for task_id, name in store_keeper.get_task_page(user_id, 0, tasks_page_size)])
         await query.edit_message_text("Список задач")
     await query.edit_message_reply_markup(keyboard)
 
@@ -146,16 +150,7 @@ async def callback_processing(update: Update, context: ContextTypes.DEFAULT_TYPE
         user_id, chat_id, days = map(int, args.split(';'))
         if verdict == 'apr':
             till_time = store_keeper.add_subscription_time(user_id, days)
-            try:
-                context.job_queue.get_jobs_by_name(f"sub{user_id}")[0].schedule_removal()
-            except Exception:
-                pass
-            context.job_queue.run_once(subscription_end, till_time - datetime.now(), name=f"sub{user_id}")
-            tasks = store_keeper.get_tasks(user_id)
-            for task in tasks:
-                if not context.job_queue.get_jobs_by_name(str(task)):
-                    context.job_queue.run_repeating(notification, task.frequency * 60, name=str(task.id),
-                                                    user_id=user_id, data=task.name)
+            store_keeper.resume_user(user_id)
             logger.info(f"Added subscription time for user {user_id} to {till_time}")
             await context.bot.send_message(chat_id, f"Вам подключена подписка до 📅"
                                                     f"{till_time.strftime('%d.%m.%Y %H:%M:%S')}. "
@@ -181,7 +176,7 @@ async def callback_processing(update: Update, context: ContextTypes.DEFAULT_TYPE
         elif func == 'del':
             task_id = int(args)
             store_keeper.remove_task(task_id)
-            context.job_queue.get_jobs_by_name(str(task_id))[0].schedule_removal()
+            store_keeper.unschedule_task(task_id)
             await list_tasks(update.effective_user.id, query, func)
             logger.info(f"Removed task: {task_id}")
         elif func == 'inf':
@@ -208,7 +203,7 @@ async def set_task_url(update: Update, context: ContextTypes.DEFAULT_TYPE) -> in
     offset, length = update.message.entities[0].offset, update.message.entities[0].length
     url = update.message.text[offset:offset + length]
     try:
-        items = store_keeper.get_last_k_items(url, 1)
+        items = await store_keeper.get_last_k_items(url, 1)
     except KeyError:
         await update.message.reply_text("Ссылка должна быть категорией с bina.az")
         return MAIN_MENU
@@ -237,36 +232,56 @@ async def set_task_name(update: Update, context: ContextTypes.DEFAULT_TYPE) -> i
     logger.debug("Setting task name")
     name = update.message.text
     url, frequency = context.user_data.pop('tsk_crt')
-    task_id = store_keeper.add_task(update.message.from_user.id, name, url, frequency)
-    context.job_queue.run_repeating(notification, frequency * 60,
-                                    name=str(task_id), user_id=update.message.from_user.id, data=name)
+    task_id = await store_keeper.add_task(update.message.from_user.id, name, url, frequency)
+    store_keeper.schedule_task(store_keeper.get_task(task_id))
     logger.info(f"Created task: {task_id}")
     await send_default_message(update, DialogLines.task_created)
     await send_default_message(update, DialogLines.main_menu)
     return MAIN_MENU
 
 
-async def notification(context: ContextTypes.DEFAULT_TYPE) -> None:
+def format_item(item: Item) -> str:
+    lines = [DialogLines.new_item_details.value.text % {"price": item.price, "location": item.location, "id": item.id}]
+    for line, value in ((DialogLines.item_rooms, item.rooms), (DialogLines.item_area, item.area),
+                        (DialogLines.item_floor, item.floor), (DialogLines.item_photo, item.photo)):
+        if value is not None:
+            lines.append(line.value.text % {"value": value})
+    return '\n'.join(lines)
+
+
+async def notification(job: PollJob) -> int:
     logger.debug("New notification")
-    task_id = int(context.job.name)
-    user_id = context.job.user_id
-    name = context.job.data
-    items = store_keeper.get_new_items(task_id)
+    new_items = await store_keeper.get_new_items(job.task_id)
+    if new_items is None:
+        return 0
+    items = new_items.items
     logger.debug(f"Find {len(items)} notifications")
-    for item in items:
-        message = f"Найдено новое объявление по задаче {name}:\nЦена: {item.price}\nМесто: {item.location}\n" \
-                  f"Подробнее: https://ru.bina.az/items/{item.id}"
-        await notifier.send_message(user_id, message)
+    texts = [format_item(item) for item in items]
+    store_keeper.record_new_items(new_items, job.user_id, job.name, texts)
+    return len(items)
 
 
 async def get_chat_id(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     await update.message.reply_text(f"Your chat id: {update.message.chat_id}\nYour ID: {update.message.from_user.id}")
 
 
-if __name__ == "__main__":
-    application = ApplicationBuilder().token(telegram_key).build()
-    notifier = Bot(telegram_second_key)
-    store_keeper = StoreKeeper(application.job_queue, notification, subscription_end)
+async def post_shutdown(application: Application) -> None:
+    await store_keeper.close()
+
+
+def build_application(token: str = telegram_key, request: BaseRequest | None = None,
+                      **store_keeper_kwargs) -> Application:
+    global store_keeper, notifier
+    builder = ApplicationBuilder().token(token).post_shutdown(post_shutdown)
+    if request is not None:
+        builder = builder.request(request).get_updates_request(request)
+    application = builder.build()
+    store_keeper = StoreKeeper(application.job_queue, notification, subscription_end, **store_keeper_kwargs)
+    if poller_shards:
+        notifier = Notifier(application.bot, store_keeper)
+    else:
+        notifier = Notifier(Bot(telegram_second_key, request=request), store_keeper, application.bot)
+    application.job_queue.run_repeating(notifier.flush, outbox_interval, name="outbox")
     application.add_handler(CommandHandler('get_chat_id', get_chat_id))
     application.add_handler(CallbackQueryHandler(callback_processing))
     conv_handler = ConversationHandler(
@@ -292,5 +307,41 @@ if __name__ == "__main__":
         per_chat=False
     )
     application.add_handler(conv_handler)
+    return application
+
+
+async def run_worker(shard: int) -> None:
+    global store_keeper, notifier
+    application = ApplicationBuilder().token(telegram_second_key).updater(None).build()
+    store_keeper = StoreKeeper(application.job_queue, notification, subscription_end, shard=shard)
+    notifier = Notifier(application.bot, store_keeper)
+    application.job_queue.run_repeating(notifier.flush, outbox_interval, name="outbox")
+    if metrics_port:
+        metrics.start_server(metrics_port + 1 + shard, metrics_host)
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(signum, stop.set)
+    async with application:
+        await application.start()
+        logger.info(f"Poller shard {shard} of {poller_shards} started")
+        await stop.wait()
+        await application.stop()
+    await store_keeper.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--worker", type=int, metavar="SHARD")
+    args = parser.parse_args()
+    if args.worker is not None:
+        if not 0 <= args.worker < poller_shards:
+            parser.error(f"shard must be in range 0..{poller_shards - 1}")
+        asyncio.run(run_worker(args.worker))
+        raise SystemExit
+    application = build_application()
+    if metrics_port:
+        metrics.start_server(metrics_port, metrics_host)
+        logger.info(f"Metrics are exported on {metrics_host}:{metrics_port}")
     logger.info("Application started")
     application.run_polling(allowed_updates=Update.ALL_TYPES)
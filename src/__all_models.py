@@ -1,2 +1,5 @@
+import src.outbox
+import src.seen_items
+import src.task_events
 import src.tasks
 import src.users
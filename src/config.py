@@ -1,12 +1,61 @@
 free_subscription = 3
 bot_name = "@Bina_az_bot"
 support_name = "@nimesheiba"
+tasks_page_size = 5
 price = {
     "7 дней": 5,
     "14 дней": 10,
     "30 дней": 15,
 }
 
+user_agent = "Mozilla/5.0 (Windows NT 10.0; Win64; x64; rv:66.0) Gecko/20100101 Firefox/66.0"
+max_concurrent_requests = 10
+max_keepalive_connections = 10
+request_timeout = 30
+http_proxy = None
+host_rate_limit = 8
+host_rate_burst = 16
+fetch_retries = 3
+fetch_backoff = 0.5
+fetch_max_backoff = 30
+circuit_max_failures = 10
+circuit_cooldown = 60
+page_cache_ttl = 60
+page_cache_size = 2048
+seen_items_retention_days = 30
+enrich_items = False
+enrichment_concurrency = 4
+enrichment_cache_ttl = 3600
+enrichment_cache_size = 4096
+enrichment_timeout = 5
+html_extractor = "lxml"
+parse_workers = 0
+poll_tick = 1
+poll_workers = 32
+poll_batch_size = 64
+poll_jitter = 0.05
+poll_catch_up_rate = 5
+poll_state_interval = 30
+adaptive_polling = False
+adaptive_min_factor = 0.5
+adaptive_max_factor = 3
+adaptive_target_items = 1
+adaptive_smoothing = 0.3
+poller_shards = 0
+task_events_interval = 2
+subscription_sweep_interval = 60
+task_events_retention_hours = 24
+outbox_interval = 2
+outbox_batch_size = 200
+outbox_max_attempts = 8
+outbox_backoff = 5
+outbox_max_backoff = 600
+metrics_host = "127.0.0.1"
+metrics_port = 9108
+tracing_enabled = False
+tracing_profile = False
+slow_job_threshold = 10
+
 try:
     with open("res/important_data.key", 'r') as f:
         card_number, admin_chat_id = f.read().strip().split(';')
@@ -26,6 +75,7 @@ except FileNotFoundError:
     raise FileNotFoundError("Can't find telegram token. It must be stored at res/telegram_second.key.key")
 
 ERROR_LOG_FILENAME = "error.log"
+SLOW_JOBS_LOG_FILENAME = "slow_jobs.log"
 LOGGER_CONFIG = {
     "version": 1,
     "disable_existing_loggers": False,
@@ -46,6 +96,14 @@ LOGGER_CONFIG = {
             "filename": ERROR_LOG_FILENAME,
             "backupCount": 2,
         },
+        "slow_jobs_logfile": {
+            "formatter": "default",
+            "level": "WARNING",
+            "class": "logging.handlers.RotatingFileHandler",
+            "filename": SLOW_JOBS_LOG_FILENAME,
+            "maxBytes": 10485760,
+            "backupCount": 2,
+        },
         "verbose_output": {
             "formatter": "simple",
             "level": "DEBUG",
@@ -66,6 +124,13 @@ LOGGER_CONFIG = {
                 "verbose_output",
             ],
         },
+        "slow_jobs": {
+            "level": "WARNING",
+            "handlers": [
+                "slow_jobs_logfile",
+            ],
+            "propagate": False,
+        },
     },
     "root": {
         "level": "INFO",
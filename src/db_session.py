@@ -1,16 +1,56 @@
+import logging
 from pathlib import Path
 import sqlalchemy as sa
 import sqlalchemy.orm as orm
 from sqlalchemy.orm import Session
 import sqlalchemy.ext.declarative as dec
-from sqlalchemy.engine import Connection
+from sqlalchemy.engine import Connection, Engine
+
+from src import metrics
 
 
 SqlAlchemyBase = dec.declarative_base()
+
+SQLITE_PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "cache_size": -32000,
+    "temp_store": "MEMORY",
+    "busy_timeout": 5000,
+    "mmap_size": 134217728,
+}
+
+logger = logging.getLogger("store_keeper")
+
 __engine = None
 __factory = None
 
 
+def set_sqlite_pragmas(dbapi_connection, connection_record) -> None:
+    cursor = dbapi_connection.cursor()
+    for key, value in SQLITE_PRAGMAS.items():
+        cursor.execute(f"PRAGMA {key}={value}")
+    cursor.close()
+
+
+def migrate(engine: Engine) -> None:
+    inspector = sa.inspect(engine)
+    existing_tables = set(inspector.get_table_names())
+    with engine.begin() as conn:
+        for table in SqlAlchemyBase.metadata.sorted_tables:
+            if table.name not in existing_tables:
+                continue
+            columns = {column["name"] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in columns:
+                    continue
+                column_type = column.type.compile(engine.dialect)
+                conn.execute(sa.text(f'ALTER TABLE "{table.name}" ADD COLUMN "{column.name}" {column_type}'))
+                logger.info(f"Added column {table.name}.{column.name}")
+            for index in table.indexes:
+                index.create(conn, checkfirst=True)
+
+
 def global_init(db_file: Path):
     global __engine, __factory
     if __factory:
@@ -19,8 +59,13 @@ def global_init(db_file: Path):
         raise Exception("You need to set db file name")
     conn_str = f'sqlite:///{db_file}?check_same_thread=False'
     __engine = sa.create_engine(conn_str, echo=False)
+    sa.event.listen(__engine, "connect", set_sqlite_pragmas)
+    sa.event.listen(__engine, "before_cursor_execute", metrics.before_cursor_execute)
+    sa.event.listen(__engine, "after_cursor_execute", metrics.after_cursor_execute)
+    sa.event.listen(__engine, "handle_error", metrics.handle_error)
     __factory = orm.sessionmaker(bind=__engine, expire_on_commit=False)
     import src.__all_models
+    migrate(__engine)
     SqlAlchemyBase.metadata.create_all(__engine)
 
 
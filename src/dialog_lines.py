@@ -56,3 +56,11 @@ class DialogLines(enum.Enum):
     set_task_name = DialogLine("Шаг:3/3. \nВведите название задачи")
     task_created = DialogLine("👍Поздравляю! Задача успешно создана!\nДля получения объявлений начните чат с "
                               "@bina_az_notifier_bot")
+    new_item = DialogLine("Найдено новое объявление по задаче %(name)s:\n%(item)s")
+    new_items = DialogLine("Найдены новые объявления по задаче %(name)s:")
+    subscription_end = DialogLine("❌Срок вашей подписки истек!")
+    new_item_details = DialogLine("Цена: %(price)s\nМесто: %(location)s\nПодробнее: https://ru.bina.az/items/%(id)s")
+    item_rooms = DialogLine("Комнат: %(value)s")
+    item_area = DialogLine("Площадь: %(value)s")
+    item_floor = DialogLine("Этаж: %(value)s")
+    item_photo = DialogLine("Фото: %(value)s")
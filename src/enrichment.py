@@ -0,0 +1,87 @@
+import asyncio
+import logging
+import re
+from dataclasses import dataclass
+from typing import List, Dict
+
+import bs4
+import httpx
+
+from src import metrics
+from src.fetcher import Fetcher
+from src.items import Item
+from src.page_cache import PageCache
+from src.rate_limit import CircuitOpenError
+
+logger = logging.getLogger("store_keeper")
+
+ITEM_URL = "https://bina.az/items/%s"
+ROOMS_LABELS = ("otaq sayı", "количество комнат")
+AREA_LABELS = ("sahə", "площадь")
+FLOOR_LABELS = ("mərtəbə", "этаж")
+
+
+@dataclass
+class ItemDetails:
+    rooms: int | None = None
+    area: str | None = None
+    floor: str | None = None
+    photo: str | None = None
+
+
+def _find_property(properties: Dict[str, str], labels: tuple) -> str | None:
+    for name, value in properties.items():
+        if name in labels:
+            return value
+    return None
+
+
+def extract_details(text: str) -> ItemDetails:
+    soup = bs4.BeautifulSoup(text, features="html.parser")
+    properties = dict()
+    for row in soup.find_all(class_="product-properties__i"):
+        name = row.find(class_="product-properties__i-name")
+        value = row.find(class_="product-properties__i-value")
+        if name is not None and value is not None:
+            properties[name.text.strip().lower()] = value.text.strip()
+    rooms = _find_property(properties, ROOMS_LABELS)
+    match = re.search(r"\d+", rooms or "")
+    photo = soup.find("meta", property="og:image")
+    return ItemDetails(int(match.group()) if match else None, _find_property(properties, AREA_LABELS),
+                       _find_property(properties, FLOOR_LABELS), photo.get("content") if photo else None)
+
+
+class Enricher:
+    def __init__(self, fetcher: Fetcher, ttl: float, max_size: int, concurrency: int, timeout: float):
+        self.fetcher = fetcher
+        self.timeout = timeout
+        self.cache: PageCache[int, ItemDetails] = PageCache(ttl, max_size, metrics.DETAILS_CACHE_REQUESTS)
+        self._semaphore = asyncio.Semaphore(concurrency)
+
+    async def fetch_details(self, item_id: int) -> ItemDetails:
+        async with self._semaphore:
+            text = await self.fetcher.get(ITEM_URL % item_id, remember=False)
+        return extract_details(text)
+
+    async def details(self, item_id: int) -> ItemDetails | None:
+        try:
+            return await self.cache.get(item_id, self.fetch_details)
+        except (httpx.HTTPError, CircuitOpenError) as e:
+            logger.warning(f"Failed to fetch details of item {item_id}: {e!r}")
+            return None
+
+    async def enrich(self, items: List[Item]) -> None:
+        lookups = {asyncio.ensure_future(self.details(item.id)): item for item in items}
+        done, pending = await asyncio.wait(lookups, timeout=self.timeout)
+        for lookup in pending:
+            lookup.cancel()
+        if pending:
+            logger.warning(f"Details of {len(pending)} items were not ready in {self.timeout}s, sending without them")
+        for lookup in done:
+            item, details = lookups[lookup], lookup.result()
+            if details is None:
+                continue
+            item.rooms = item.rooms if item.rooms is not None else details.rooms
+            item.area = details.area
+            item.floor = details.floor
+            item.photo = details.photo
@@ -0,0 +1,114 @@
+import logging
+import re
+from dataclasses import astuple
+from typing import List, Callable, Dict, Tuple
+
+import bs4
+
+from src.items import Item
+
+try:
+    import lxml.etree
+    import lxml.html
+except ImportError:
+    lxml = None
+
+logger = logging.getLogger("store_keeper")
+
+SKIPPED_CARDS = 4
+PRICE_PATTERN = re.compile(r"(\d[\d\s]*(?:[.,]\d+)?)\s*(\S+)?")
+ROOMS_PATTERN = re.compile(r"(\d+)\s*-\s*(?:otaq|комн)", re.IGNORECASE)
+
+
+def _item_id(href: str) -> int:
+    return int(href.split('/')[-1])
+
+
+def _clean_text(text: str) -> str:
+    return ' '.join(text.split())
+
+
+def _make_item(id: int, price: str, place: str, name: str) -> Item:
+    price, place, name = _clean_text(price), _clean_text(place), _clean_text(name)
+    price_value, currency = None, None
+    match = PRICE_PATTERN.search(price)
+    if match:
+        price_value = float(re.sub(r"\s", "", match.group(1)).replace(",", "."))
+        currency = match.group(2)
+    match = ROOMS_PATTERN.search(name)
+    return Item(id, price, place, price_value, currency, int(match.group(1)) if match else None)
+
+
+def _extract_soup_cards(cards: List[bs4.Tag]) -> List[Item]:
+    items = []
+    for card in cards[SKIPPED_CARDS:]:
+        try:
+            price = card.find("div", class_="price").text
+            place = card.find("div", class_="location").text
+            id = _item_id(card.find("a", class_="item_link")['href'])
+            name = card.find("ul", class_="name")
+            items.append(_make_item(id, price, place, name.text if name else ""))
+        except Exception as e:
+            logger.warning(f"Skipped listing card: {e!r}")
+    return items
+
+
+def extract_items_soup(text: str) -> List[Item]:
+    soup = bs4.BeautifulSoup(text, features="html.parser")
+    return _extract_soup_cards(soup.find_all("div", {"class": "items-i"}))
+
+
+def _is_card_class(value: str | None) -> bool:
+    return value is not None and "items-i" in value.split()
+
+
+def extract_items_strainer(text: str) -> List[Item]:
+    strainer = bs4.SoupStrainer("div", class_=_is_card_class)
+    soup = bs4.BeautifulSoup(text, features="html.parser", parse_only=strainer)
+    return _extract_soup_cards(soup.find_all("div", {"class": "items-i"}))
+
+
+if lxml is not None:
+    def _class_xpath(prefix: str, tag: str, class_name: str) -> lxml.etree.XPath:
+        return lxml.etree.XPath(f'{prefix}{tag}[contains(concat(" ", normalize-space(@class), " "), " {class_name} ")]')
+
+    _cards_xpath = _class_xpath("//", "div", "items-i")
+    _price_xpath = _class_xpath(".//", "div", "price")
+    _location_xpath = _class_xpath(".//", "div", "location")
+    _link_xpath = _class_xpath(".//", "a", "item_link")
+    _name_xpath = _class_xpath(".//", "ul", "name")
+
+    def extract_items_lxml(text: str) -> List[Item]:
+        if not text.strip():
+            return []
+        tree = lxml.html.fromstring(text)
+        items = []
+        for card in _cards_xpath(tree)[SKIPPED_CARDS:]:
+            try:
+                price = _price_xpath(card)[0].text_content()
+                place = _location_xpath(card)[0].text_content()
+                id = _item_id(_link_xpath(card)[0].get('href'))
+                name = _name_xpath(card)
+                items.append(_make_item(id, price, place, name[0].text_content() if name else ""))
+            except Exception as e:
+                logger.warning(f"Skipped listing card: {e!r}")
+        return items
+
+
+EXTRACTORS: Dict[str, Callable[[str], List[Item]]] = {
+    "soup": extract_items_soup,
+    "strainer": extract_items_strainer,
+}
+if lxml is not None:
+    EXTRACTORS["lxml"] = extract_items_lxml
+
+
+def get_extractor(name: str) -> Callable[[str], List[Item]]:
+    if name not in EXTRACTORS:
+        logger.warning(f"HTML extractor {name} is not available, falling back to soup")
+        return extract_items_soup
+    return EXTRACTORS[name]
+
+
+def extract_item_tuples(text: str, name: str) -> List[Tuple]:
+    return [astuple(item) for item in get_extractor(name)(text)]
@@ -0,0 +1,121 @@
+import asyncio
+import hashlib
+import logging
+import random
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict
+
+import httpx
+
+from src import metrics
+from src.config import user_agent, max_concurrent_requests, max_keepalive_connections, request_timeout, http_proxy, \
+    page_cache_size, host_rate_limit, host_rate_burst, fetch_retries, fetch_backoff, fetch_max_backoff, \
+    circuit_max_failures, circuit_cooldown, poller_shards
+from src.rate_limit import HostLimiter
+
+logger = logging.getLogger("store_keeper")
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+@dataclass
+class PageValidator:
+    etag: str | None = None
+    last_modified: str | None = None
+    body_hash: str | None = None
+
+
+class Fetcher:
+    def __init__(self, max_connections: int = max_concurrent_requests, proxy: str | None = http_proxy,
+                 max_validators: int = page_cache_size, rate_limit: float = host_rate_limit / max(poller_shards, 1),
+                 retries: int = fetch_retries):
+        self._client = httpx.AsyncClient(
+            headers={"User-Agent": user_agent},
+            limits=httpx.Limits(max_connections=max_connections,
+                                max_keepalive_connections=min(max_keepalive_connections, max_connections)),
+            timeout=request_timeout,
+            follow_redirects=True,
+            proxy=proxy
+        )
+        self._semaphore = asyncio.Semaphore(max_connections)
+        self._validators: OrderedDict[str, PageValidator] = OrderedDict()
+        self.max_validators = max_validators
+        self.retries = retries
+        self.limiter = HostLimiter(rate_limit, host_rate_burst / max(poller_shards, 1), circuit_max_failures,
+                                   circuit_cooldown)
+
+    def fingerprint(self, url: str) -> str | None:
+        validator = self._validators.get(url)
+        return validator.body_hash if validator else None
+
+    async def get(self, url: str, conditional: bool = False, remember: bool = True) -> str | None:
+        validator = self._validators.get(url)
+        headers = dict()
+        if conditional and validator is not None:
+            if validator.etag:
+                headers["If-None-Match"] = validator.etag
+            if validator.last_modified:
+                headers["If-Modified-Since"] = validator.last_modified
+        r = await self.request(url, headers)
+        if not remember:
+            r.raise_for_status()
+            return r.text
+        if r.status_code == 304 and conditional and validator is not None:
+            logger.debug(f"Not modified {url}")
+            self._validators.move_to_end(url)
+            return None
+        body_hash = hashlib.blake2b(r.content, digest_size=16).hexdigest()
+        unchanged = validator is not None and validator.body_hash == body_hash
+        self._validators[url] = PageValidator(r.headers.get("ETag"), r.headers.get("Last-Modified"), body_hash)
+        self._validators.move_to_end(url)
+        while len(self._validators) > self.max_validators:
+            self._validators.popitem(last=False)
+        if conditional and unchanged:
+            logger.debug(f"Unchanged {url}")
+            return None
+        return r.text
+
+    async def request(self, url: str, headers: Dict[str, str]) -> httpx.Response:
+        host = httpx.URL(url).host
+        bucket = self.limiter.bucket(host)
+        breaker = self.limiter.breaker(host)
+        attempt = 0
+        while True:
+            breaker.check()
+            metrics.RATE_LIMIT_WAIT_SECONDS.observe(await bucket.acquire())
+            try:
+                async with self._semaphore:
+                    logger.debug(f"Fetching {url}")
+                    with metrics.FETCH_SECONDS.time():
+                        r = await self._client.get(url, headers=headers)
+            except httpx.TransportError as e:
+                breaker.record_failure()
+                if attempt >= self.retries:
+                    raise
+                reason, retry_after = type(e).__name__, None
+            else:
+                metrics.FETCH_RESPONSES.labels(r.status_code).inc()
+                if r.status_code not in RETRY_STATUSES:
+                    breaker.record_success()
+                    return r
+                breaker.record_failure()
+                if attempt >= self.retries:
+                    r.raise_for_status()
+                reason, retry_after = str(r.status_code), self.retry_after(r)
+            delay = retry_after if retry_after is not None else \
+                min(fetch_backoff * 2 ** attempt, fetch_max_backoff) * random.uniform(0.5, 1)
+            metrics.FETCH_RETRIES.labels(reason).inc()
+            logger.warning(f"Request to {url} failed ({reason}), retrying in {delay:.1f}s")
+            await asyncio.sleep(delay)
+            attempt += 1
+
+    @staticmethod
+    def retry_after(response: httpx.Response) -> float | None:
+        value = response.headers.get("Retry-After")
+        if value is None or not value.strip().isdigit():
+            return None
+        return min(float(value), fetch_max_backoff)
+
+    async def close(self) -> None:
+        await self._client.aclose()
@@ -6,3 +6,9 @@ class Item:
     id: int
     price: str
     location: str
+    price_value: float | None = None
+    currency: str | None = None
+    rooms: int | None = None
+    area: str | None = None
+    floor: str | None = None
+    photo: str | None = None
@@ -0,0 +1,47 @@
+import time
+
+from prometheus_client import Counter, Gauge, Histogram, start_http_server
+
+FETCH_SECONDS = Histogram("bina_fetch_seconds", "HTTP fetch latency of bina.az pages")
+FETCH_RESPONSES = Counter("bina_fetch_responses_total", "HTTP responses from bina.az by status", ["status"])
+FETCH_RETRIES = Counter("bina_fetch_retries_total", "Retried bina.az requests by reason", ["reason"])
+RATE_LIMIT_WAIT_SECONDS = Histogram("bina_rate_limit_wait_seconds", "Time spent waiting for a request token",
+                                    buckets=(0, .01, .05, .1, .25, .5, 1, 2.5, 5, 10))
+CIRCUIT_TRIPS = Counter("bina_circuit_trips_total", "Times the circuit breaker paused requests to a host", ["host"])
+PAGE_CACHE_REQUESTS = Counter("bina_page_cache_requests_total", "Listing page cache lookups", ["result"])
+DETAILS_CACHE_REQUESTS = Counter("bina_details_cache_requests_total", "Item details cache lookups", ["result"])
+PARSE_SECONDS = Histogram("bina_parse_seconds", "Listing page parse latency",
+                          buckets=(.001, .0025, .005, .01, .025, .05, .1, .25, .5, 1))
+PARSED_ITEMS = Counter("bina_parsed_items_total", "Listing items extracted from pages")
+SEEN_DIFF_SECONDS = Histogram("bina_seen_diff_seconds", "Seen items lookup latency per page",
+                              buckets=(.0005, .001, .0025, .005, .01, .025, .05, .1, .25))
+DB_QUERY_SECONDS = Histogram("bina_db_query_seconds", "SQLite statement latency",
+                             buckets=(.0001, .0005, .001, .0025, .005, .01, .025, .05, .1, .25, 1))
+TELEGRAM_SEND_SECONDS = Histogram("bina_telegram_send_seconds", "Telegram send_message latency")
+TELEGRAM_SENDS = Counter("bina_telegram_sends_total", "Telegram notification sends by result", ["result"])
+JOB_SECONDS = Histogram("bina_poll_job_seconds", "Poll job duration",
+                        buckets=(.01, .05, .1, .25, .5, 1, 2.5, 5, 10, 30, 60))
+JOB_LAG_SECONDS = Histogram("bina_poll_job_lag_seconds", "Delay between scheduled and actual poll job start",
+                            buckets=(.01, .1, .5, 1, 2.5, 5, 10, 30, 60, 300))
+NEW_ITEMS = Counter("bina_new_items_total", "New listings found by poll jobs")
+SCHEDULED_TASKS = Gauge("bina_scheduled_tasks", "Tasks registered in the poll scheduler")
+QUEUE_DEPTH = Gauge("bina_poll_queue_depth", "Due poll jobs waiting for a worker")
+DISPATCH_LAG = Gauge("bina_poll_dispatch_lag_seconds", "Largest poll job delay in the latest dispatch tick")
+RUNNING_JOBS = Gauge("bina_poll_running_jobs", "Poll jobs currently running")
+
+
+def before_cursor_execute(conn, cursor, statement, parameters, context, executemany) -> None:
+    conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+
+def after_cursor_execute(conn, cursor, statement, parameters, context, executemany) -> None:
+    DB_QUERY_SECONDS.observe(time.perf_counter() - conn.info["query_started"].pop())
+
+
+def handle_error(context) -> None:
+    if context.connection is not None and context.connection.info.get("query_started"):
+        context.connection.info["query_started"].pop()
+
+
+def start_server(port: int, host: str) -> None:
+    start_http_server(port, host)
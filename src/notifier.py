@@ -0,0 +1,93 @@
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from datetime import timedelta
+from typing import List, Tuple, Dict
+
+from telegram import Bot
+from telegram.constants import MessageLimit
+from telegram.error import RetryAfter, Forbidden, BadRequest, TelegramError
+from telegram.ext import ContextTypes
+
+from src import metrics, tracing
+from src.config import outbox_batch_size, outbox_max_attempts, outbox_backoff, outbox_max_backoff
+from src.dialog_lines import DialogLines
+from src.outbox import OutboxMessage
+from src.store_keeper import StoreKeeper
+
+logger = logging.getLogger("bot")
+
+
+class Notifier:
+    def __init__(self, bot: Bot, store_keeper: StoreKeeper, service_bot: Bot | None = None):
+        self.bot = bot
+        self.service_bot = service_bot or bot
+        self.store_keeper = store_keeper
+        self._lock = asyncio.Lock()
+
+    @staticmethod
+    def compose(task_name: str | None, messages: List[OutboxMessage]) -> List[Tuple[List[OutboxMessage], str]]:
+        if task_name is None:
+            return [([message], message.text[:MessageLimit.MAX_TEXT_LENGTH]) for message in messages]
+        if len(messages) == 1:
+            text = DialogLines.new_item.value.text % {"name": task_name, "item": messages[0].text}
+            return [(messages, text[:MessageLimit.MAX_TEXT_LENGTH])]
+        chunks = []
+        chunk: List[OutboxMessage] = []
+        header = DialogLines.new_items.value.text % {"name": task_name}
+        length = len(header)
+        for message in messages:
+            if chunk and length + 2 + len(message.text) > MessageLimit.MAX_TEXT_LENGTH:
+                chunks.append(chunk)
+                chunk = []
+                length = len(header)
+            chunk.append(message)
+            length += 2 + len(message.text)
+        chunks.append(chunk)
+        return [(chunk, '\n\n'.join([header] + [message.text for message in chunk])[:MessageLimit.MAX_TEXT_LENGTH])
+                for chunk in chunks]
+
+    async def flush(self, context: ContextTypes.DEFAULT_TYPE | None = None) -> None:
+        if self._lock.locked():
+            return
+        async with self._lock, tracing.trace_job("outbox_flush"):
+            messages = self.store_keeper.get_pending_notifications(int(time.time()), outbox_batch_size)
+            groups: Dict[Tuple[int, int], List[OutboxMessage]] = OrderedDict()
+            for message in messages:
+                groups.setdefault((message.user_id, message.task_id), []).append(message)
+            pending = [chunk for group in groups.values() for chunk in self.compose(group[0].task_name, group)]
+            for i, (chunk, text) in enumerate(pending):
+                ids = [message.id for message in chunk]
+                try:
+                    with metrics.TELEGRAM_SEND_SECONDS.time(), \
+                            tracing.span("send_message", user_id=chunk[0].user_id, messages=len(chunk)):
+                        bot = self.service_bot if chunk[0].task_id is None else self.bot
+                        await bot.send_message(chunk[0].user_id, text)
+                except RetryAfter as e:
+                    metrics.TELEGRAM_SENDS.labels("retry_after").inc()
+                    retry_after = e.retry_after
+                    if isinstance(retry_after, timedelta):
+                        retry_after = retry_after.total_seconds()
+                    logger.warning(f"Telegram flood control, retrying in {retry_after}s")
+                    self.store_keeper.postpone_notifications([message.id for chunk, _ in pending[i:]
+                                                              for message in chunk], retry_after)
+                    return
+                except (Forbidden, BadRequest) as e:
+                    metrics.TELEGRAM_SENDS.labels("dropped").inc()
+                    logger.warning(f"Dropped notification for user {chunk[0].user_id}: {e}")
+                    self.store_keeper.delete_notifications(ids)
+                except TelegramError as e:
+                    metrics.TELEGRAM_SENDS.labels("error").inc()
+                    attempts = max(message.attempts or 0 for message in chunk) + 1
+                    if attempts >= outbox_max_attempts:
+                        logger.error(f"Dropped notification for user {chunk[0].user_id} after {attempts} attempts",
+                                     exc_info=e)
+                        self.store_keeper.delete_notifications(ids)
+                    else:
+                        delay = min(outbox_backoff * 2 ** (attempts - 1), outbox_max_backoff)
+                        logger.warning(f"Notification for user {chunk[0].user_id} failed, retrying in {delay}s: {e}")
+                        self.store_keeper.postpone_notifications(ids, delay, attempts)
+                else:
+                    metrics.TELEGRAM_SENDS.labels("ok").inc()
+                    self.store_keeper.delete_notifications(ids)
@@ -0,0 +1,18 @@
+import sqlalchemy
+from sqlalchemy_serializer import SerializerMixin
+
+from src.db_session import SqlAlchemyBase
+
+
+class OutboxMessage(SqlAlchemyBase, SerializerMixin):
+    __tablename__ = 'outbox'
+    __table_args__ = (sqlalchemy.Index('ix_outbox_next_attempt', 'next_attempt'), {'extend_existing': True})
+
+    id = sqlalchemy.Column(sqlalchemy.Integer, primary_key=True, autoincrement=True)
+    user_id = sqlalchemy.Column(sqlalchemy.Integer)
+    task_id = sqlalchemy.Column(sqlalchemy.Integer)
+    task_name = sqlalchemy.Column(sqlalchemy.String)
+    text = sqlalchemy.Column(sqlalchemy.String)
+    created_at = sqlalchemy.Column(sqlalchemy.Integer)
+    attempts = sqlalchemy.Column(sqlalchemy.Integer, default=0)
+    next_attempt = sqlalchemy.Column(sqlalchemy.Integer)
@@ -0,0 +1,50 @@
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Dict, Tuple, Callable, Awaitable, Generic, TypeVar, Hashable
+
+from prometheus_client import Counter
+
+from src import metrics
+
+K = TypeVar("K", bound=Hashable)
+V = TypeVar("V")
+
+
+class PageCache(Generic[K, V]):
+    def __init__(self, ttl: float, max_size: int, requests: Counter = metrics.PAGE_CACHE_REQUESTS):
+        self.ttl = ttl
+        self.max_size = max_size
+        self.requests = requests
+        self._entries: OrderedDict[K, Tuple[float, V]] = OrderedDict()
+        self._pending: Dict[K, asyncio.Task] = dict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def peek(self, url: K) -> V | None:
+        entry = self._entries.get(url)
+        return entry[1] if entry is not None else None
+
+    async def get(self, url: K, loader: Callable[[K], Awaitable[V]]) -> V:
+        entry = self._entries.get(url)
+        if entry is not None and time.monotonic() - entry[0] < self.ttl:
+            self._entries.move_to_end(url)
+            self.requests.labels("hit").inc()
+            return entry[1]
+        task = self._pending.get(url)
+        self.requests.labels("miss" if task is None else "coalesced").inc()
+        if task is None:
+            task = asyncio.ensure_future(loader(url))
+            self._pending[url] = task
+            task.add_done_callback(lambda t: self._store(url, t))
+        return await asyncio.shield(task)
+
+    def _store(self, url: K, task: asyncio.Task) -> None:
+        self._pending.pop(url, None)
+        if task.cancelled() or task.exception() is not None:
+            return
+        self._entries[url] = (time.monotonic(), task.result())
+        self._entries.move_to_end(url)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
@@ -0,0 +1,191 @@
+import asyncio
+import heapq
+import logging
+import random
+import time
+from dataclasses import dataclass
+from typing import Callable, Coroutine, Any, Dict, List, Tuple, Iterable, Set
+
+from telegram.ext import ContextTypes
+
+from src import metrics, tracing
+from src.rate_limit import CircuitOpenError
+
+logger = logging.getLogger("store_keeper")
+
+
+@dataclass
+class PollJob:
+    task_id: int
+    user_id: int
+    name: str
+    url: str
+    interval: float
+    due: float = 0.0
+    last_run: float | None = None
+
+
+class ListingVelocity:
+    def __init__(self, min_factor: float, max_factor: float, target_items: float, smoothing: float,
+                 warmup: int = 3):
+        self.min_factor = min_factor
+        self.max_factor = max_factor
+        self.target_items = target_items
+        self.smoothing = smoothing
+        self.warmup = warmup
+        self._rates: Dict[str, Tuple[float, int]] = dict()
+
+    def observe(self, url: str, new_items: int, elapsed: float) -> None:
+        if elapsed <= 0:
+            return
+        rate = new_items / elapsed
+        previous = self._rates.get(url)
+        if previous is None:
+            self._rates[url] = (rate, 1)
+            return
+        previous_rate, observations = previous
+        self._rates[url] = (self.smoothing * rate + (1 - self.smoothing) * previous_rate, observations + 1)
+
+    def interval(self, url: str, interval: float) -> float:
+        entry = self._rates.get(url)
+        if entry is None or entry[1] < self.warmup:
+            return interval
+        expected = entry[0] * interval
+        factor = self.target_items / expected if expected > 0 else self.max_factor
+        return interval * min(max(factor, self.min_factor), self.max_factor)
+
+
+class PollScheduler:
+    def __init__(self, poll: Callable[[PollJob], Coroutine[Any, Any, int | None]], workers: int, batch_size: int,
+                 jitter: float, velocity: ListingVelocity | None = None, catch_up_rate: float = 5):
+        self.poll = poll
+        self.catch_up_rate = catch_up_rate
+        self.velocity = velocity
+        self.batch_size = batch_size
+        self.jitter = jitter
+        self.lag = 0.0
+        self._jobs: Dict[int, PollJob] = dict()
+        self._heap: List[Tuple[float, int]] = []
+        self._running: Set[int] = set()
+        self._dirty: Set[int] = set()
+        self._waiting = 0
+        self._backlog = 0
+        self._workers = asyncio.Semaphore(workers)
+        self._tasks: Set[asyncio.Task] = set()
+
+    def __contains__(self, task_id: int) -> bool:
+        return task_id in self._jobs
+
+    def __len__(self) -> int:
+        return len(self._jobs)
+
+    @property
+    def queue_depth(self) -> int:
+        return self._waiting + self._backlog
+
+    @property
+    def running(self) -> int:
+        return len(self._running) - self._waiting
+
+    def add(self, job: PollJob, first: float | None = None) -> None:
+        now = time.time()
+        if first is not None:
+            job.due = now + first
+        elif job.due:
+            job.due = max(job.due, now)
+        else:
+            job.due = now + random.uniform(0, job.interval)
+        self._jobs[job.task_id] = job
+        heapq.heappush(self._heap, (job.due, job.task_id))
+
+    def add_many(self, jobs: Iterable[PollJob]) -> int:
+        now = time.time()
+        jobs = list(jobs)
+        overdue = []
+        for job in jobs:
+            if not job.due:
+                job.due = now + random.uniform(0, job.interval)
+            elif job.due <= now:
+                overdue.append(job)
+            self._jobs[job.task_id] = job
+        overdue.sort(key=lambda x: x.due)
+        for position, job in enumerate(overdue):
+            job.due = now + position / self.catch_up_rate
+        self._heap.extend((job.due, job.task_id) for job in jobs)
+        heapq.heapify(self._heap)
+        return len(overdue)
+
+    def remove(self, task_id: int) -> PollJob | None:
+        self._dirty.discard(task_id)
+        return self._jobs.pop(task_id, None)
+
+    def dirty_jobs(self) -> List[PollJob]:
+        self._dirty.intersection_update(self._jobs)
+        return [self._jobs[task_id] for task_id in self._dirty]
+
+    def mark_clean(self, task_ids: Iterable[int]) -> None:
+        self._dirty.difference_update(task_ids)
+
+    def interval(self, job: PollJob) -> float:
+        if self.velocity is None:
+            return job.interval
+        return self.velocity.interval(job.url, job.interval)
+
+    def _next_due(self, job: PollJob, now: float) -> float:
+        interval = self.interval(job)
+        due = job.due + interval * (1 + random.uniform(-self.jitter, self.jitter))
+        return due if due > now else now + interval
+
+    async def dispatch(self, context: ContextTypes.DEFAULT_TYPE) -> None:
+        now = time.time()
+        dispatched = 0
+        lag = 0.0
+        while self._heap and self._heap[0][0] <= now and dispatched < self.batch_size:
+            due, task_id = heapq.heappop(self._heap)
+            job = self._jobs.get(task_id)
+            if job is None or job.due != due:
+                continue
+            job.due = self._next_due(job, now)
+            heapq.heappush(self._heap, (job.due, task_id))
+            self._dirty.add(task_id)
+            if task_id in self._running:
+                logger.warning(f"Task {task_id} is still running, skipping tick")
+                continue
+            lag = max(lag, now - due)
+            self._running.add(task_id)
+            task = asyncio.create_task(self._run(job, due))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+            dispatched += 1
+        self.lag = lag
+        self._backlog = sum(1 for due, _ in self._heap if due <= now) if dispatched >= self.batch_size else 0
+        if dispatched:
+            logger.debug(f"Dispatched {dispatched} poll jobs, queue depth {self.queue_depth}, lag {lag:.2f}s")
+
+    async def _run(self, job: PollJob, scheduled: float) -> None:
+        try:
+            self._waiting += 1
+            try:
+                await self._workers.acquire()
+            finally:
+                self._waiting -= 1
+            started = time.time()
+            metrics.JOB_LAG_SECONDS.observe(max(started - scheduled, 0))
+            try:
+                with metrics.JOB_SECONDS.time():
+                    async with tracing.trace_job("poll", task_id=job.task_id, url=job.url):
+                        new_items = await self.poll(job)
+            finally:
+                self._workers.release()
+            if new_items:
+                metrics.NEW_ITEMS.inc(new_items)
+            if self.velocity is not None and new_items is not None and job.last_run is not None:
+                self.velocity.observe(job.url, new_items, started - job.last_run)
+            job.last_run = started
+            self._dirty.add(job.task_id)
+        except CircuitOpenError as e:
+            logger.debug(f"Poll job for task {job.task_id} skipped: {e}")
+        except Exception as e:
+            logger.error(f"Poll job for task {job.task_id} failed", exc_info=e)
+        finally:
+            self._running.discard(job.task_id)
@@ -0,0 +1,97 @@
+import asyncio
+import logging
+import time
+from typing import Dict
+
+from src import metrics
+
+logger = logging.getLogger("store_keeper")
+
+
+class CircuitOpenError(Exception):
+    pass
+
+
+class TokenBucket:
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = max(burst, 1)
+        self._tokens = self.burst
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self) -> float:
+        if self.rate <= 0:
+            return 0.0
+        start = time.monotonic()
+        async with self._lock:
+            self._refill()
+            while self._tokens < 1:
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+                self._refill()
+            self._tokens -= 1
+        return time.monotonic() - start
+
+
+class CircuitBreaker:
+    def __init__(self, host: str, max_failures: int, cooldown: float):
+        self.host = host
+        self.max_failures = max_failures
+        self.cooldown = cooldown
+        self.failures = 0
+        self.opened_at: float | None = None
+        self._probe_at: float | None = None
+
+    @property
+    def open(self) -> bool:
+        return self.opened_at is not None
+
+    def check(self) -> None:
+        if self.opened_at is None:
+            return
+        now = time.monotonic()
+        probing = self._probe_at is not None and now - self._probe_at < self.cooldown
+        if probing or now - self.opened_at < self.cooldown:
+            raise CircuitOpenError(f"Requests to {self.host} are paused")
+        self._probe_at = now
+
+    def record_success(self) -> None:
+        if self.opened_at is not None:
+            logger.info(f"Circuit for {self.host} closed")
+        self.failures = 0
+        self.opened_at = None
+        self._probe_at = None
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        if self._probe_at is not None or (self.opened_at is None and self.failures >= self.max_failures):
+            logger.warning(f"Circuit for {self.host} opened after {self.failures} failures, "
+                           f"pausing for {self.cooldown}s")
+            metrics.CIRCUIT_TRIPS.labels(self.host).inc()
+            self.opened_at = time.monotonic()
+            self._probe_at = None
+
+
+class HostLimiter:
+    def __init__(self, rate: float, burst: float, max_failures: int, cooldown: float):
+        self.rate = rate
+        self.burst = burst
+        self.max_failures = max_failures
+        self.cooldown = cooldown
+        self._buckets: Dict[str, TokenBucket] = dict()
+        self._breakers: Dict[str, CircuitBreaker] = dict()
+
+    def bucket(self, host: str) -> TokenBucket:
+        if host not in self._buckets:
+            self._buckets[host] = TokenBucket(self.rate, self.burst)
+        return self._buckets[host]
+
+    def breaker(self, host: str) -> CircuitBreaker:
+        if host not in self._breakers:
+            self._breakers[host] = CircuitBreaker(host, self.max_failures, self.cooldown)
+        return self._breakers[host]
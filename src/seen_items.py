@@ -0,0 +1,14 @@
+import sqlalchemy
+from sqlalchemy_serializer import SerializerMixin
+
+from src.db_session import SqlAlchemyBase
+
+
+class SeenItem(SqlAlchemyBase, SerializerMixin):
+    __tablename__ = 'seen_item'
+    __table_args__ = (sqlalchemy.Index('ix_seen_item_last_seen', 'last_seen'), {'extend_existing': True})
+
+    task_id = sqlalchemy.Column(sqlalchemy.Integer, primary_key=True)
+    item_id = sqlalchemy.Column(sqlalchemy.Integer, primary_key=True)
+    first_seen = sqlalchemy.Column(sqlalchemy.Integer)
+    last_seen = sqlalchemy.Column(sqlalchemy.Integer)
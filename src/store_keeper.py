@@ -1,202 +1,556 @@
+import asyncio
 import logging
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
 from datetime import datetime, timedelta
+from itertools import islice
 from pathlib import Path
-from typing import List, Callable, Coroutine, Any
+from typing import List, Callable, Coroutine, Any, Tuple, Dict, AsyncIterator, Iterable, Set
 
-import requests as requests
-import bs4
-from sqlalchemy import select
+from sqlalchemy import select, insert, update, delete, func, bindparam
 from telegram.ext import JobQueue, ContextTypes
 
-from src import db_session
-from src.config import free_subscription
+from src import db_session, metrics, urls
+from src.config import free_subscription, page_cache_ttl, page_cache_size, seen_items_retention_days, \
+    html_extractor, parse_workers, poll_tick, poll_workers, poll_batch_size, poll_jitter, poll_catch_up_rate, \
+    poll_state_interval, adaptive_polling, adaptive_min_factor, \
+    adaptive_max_factor, adaptive_target_items, adaptive_smoothing, poller_shards, task_events_interval, \
+    task_events_retention_hours, subscription_sweep_interval, enrich_items, enrichment_concurrency, \
+    enrichment_cache_ttl, enrichment_cache_size, enrichment_timeout
+from src.enrichment import Enricher
+from src.extractors import get_extractor, extract_item_tuples
+from src.fetcher import Fetcher
 from src.items import Item
+from src.outbox import OutboxMessage
+from src.page_cache import PageCache
+from src.poll_scheduler import PollScheduler, PollJob, ListingVelocity
+from src.seen_items import SeenItem
+from src.task_events import TaskEvent
 from src.tasks import Task
+from src.tracing import traced, span
 from src.users import User
 
 
 logger = logging.getLogger("store_keeper")
 
 
+@dataclass
+class NewItems:
+    task_id: int
+    item_ids: List[int]
+    items: List[Item]
+    fingerprint: str | None = None
+
+
 class StoreKeeper:
     def __init__(self, job_queue: JobQueue,
-                 notification: Callable[[ContextTypes.DEFAULT_TYPE], Coroutine[Any, Any, None]],
-                 subscription_end: Callable[[ContextTypes.DEFAULT_TYPE], Coroutine[Any, Any, None]]):
-        db_session.global_init(Path().resolve() / "res/db/bina_data.sqlite")
-        users = self.get_all_active_users()
-        now = datetime.now()
-        for user in users:
-            job_queue.run_once(subscription_end, datetime.fromtimestamp(user.subscription_till) - now,
-                               name=f"sub{user.id}", user_id=user.id)
-        user_ids = list(map(lambda x: x.id, users))
-        tasks = self.get_all_tasks()
-        for task in tasks:
-            if task.user_id not in user_ids:
-                continue
-            job_queue.run_repeating(notification, task.frequency * 60, name=str(task.id), user_id=task.user_id,
-                                    data=task.name)
+                 notification: Callable[[PollJob], Coroutine[Any, Any, int | None]],
+                 subscription_end: Callable[[List[int]], Coroutine[Any, Any, None]],
+                 db_file: Path | None = None, fetcher: Fetcher | None = None, shard: int | None = None):
+        db_session.global_init(db_file or Path().resolve() / "res/db/bina_data.sqlite")
+        self.shard = shard
+        self.polling = shard is not None or not poller_shards
+        self.subscription_end = subscription_end
+        self._last_sweep = datetime.now().timestamp()
+        self.fetcher = fetcher or Fetcher()
+        self.page_cache: PageCache[str, List[Item]] = PageCache(page_cache_ttl, page_cache_size)
+        self.enricher = Enricher(self.fetcher, enrichment_cache_ttl, enrichment_cache_size, enrichment_concurrency,
+                                 enrichment_timeout) if enrich_items else None
+        self.extract_items = get_extractor(html_extractor)
+        self.parse_pool = ProcessPoolExecutor(parse_workers, mp_context=multiprocessing.get_context("spawn")) \
+            if parse_workers else None
+        velocity = ListingVelocity(adaptive_min_factor, adaptive_max_factor, adaptive_target_items,
+                                   adaptive_smoothing) if adaptive_polling else None
+        self.scheduler = PollScheduler(notification, poll_workers, poll_batch_size, poll_jitter, velocity,
+                                       poll_catch_up_rate)
+        metrics.SCHEDULED_TASKS.set_function(lambda: len(self.scheduler))
+        metrics.QUEUE_DEPTH.set_function(lambda: self.scheduler.queue_depth)
+        metrics.DISPATCH_LAG.set_function(lambda: self.scheduler.lag)
+        metrics.RUNNING_JOBS.set_function(lambda: self.scheduler.running)
+        if self.polling:
+            job_queue.run_repeating(self.scheduler.dispatch, poll_tick, name="poll_scheduler")
+            job_queue.run_repeating(self.save_poll_state, poll_state_interval, name="poll_state")
+        if shard is None:
+            self.migrate_last_items()
+            job_queue.run_repeating(self.prune_seen_items, timedelta(days=1), first=60, name="prune_seen_items")
+            job_queue.run_repeating(self.sweep_subscriptions, subscription_sweep_interval, name="subscriptions")
+        else:
+            self._last_event_id = self.get_last_task_event_id()
+            job_queue.run_repeating(self.process_task_events, task_events_interval, name="task_events")
+        self.warm_start()
         logger.debug("Initialized store keeper")
 
     @staticmethod
-    def new_user(user_id: int) -> datetime:
+    def make_poll_job(task: Task) -> PollJob:
+        return PollJob(task.id, task.user_id, task.name, task.url, task.frequency * 60, task.next_due_at or 0.0,
+                       task.last_run_at)
+
+    def owns(self, task_id: int) -> bool:
+        return self.shard is None or task_id % poller_shards == self.shard
+
+    def schedule_task(self, task: Task) -> None:
+        if not self.polling:
+            self.publish_task_event(task.id, "add")
+            return
+        if task.id in self.scheduler or not self.owns(task.id):
+            return
+        self.scheduler.add(self.make_poll_job(task))
+
+    def unschedule_task(self, task_id: int) -> None:
+        self.unschedule_tasks([task_id])
+
+    def unschedule_tasks(self, task_ids: List[int]) -> None:
+        if not self.polling:
+            self.publish_task_events(task_ids, "remove")
+            return
+        for task_id in task_ids:
+            self.scheduler.remove(task_id)
+
+    @staticmethod
+    def publish_task_event(task_id: int, action: str) -> None:
+        StoreKeeper.publish_task_events([task_id], action)
+
+    @staticmethod
+    def publish_task_events(task_ids: List[int], action: str) -> None:
+        if not task_ids:
+            return
+        now = int(datetime.now().timestamp())
         session = db_session.create_session()
-        user = session.execute(select(User).where(User.id == user_id)).scalar()
-        if user:
-            session.close()
-            raise KeyError("User already exists")
-        user = User()
-        user.id = user_id
-        subscription_till = datetime.now() + timedelta(free_subscription)
-        user.subscription_till = subscription_till.timestamp()
-        session.add(user)
+        session.execute(insert(TaskEvent), [{"task_id": task_id, "action": action, "created_at": now}
+                                            for task_id in task_ids])
         session.commit()
         session.close()
-        return subscription_till
 
     @staticmethod
-    def get_all_active_users() -> List[User]:
+    def get_last_task_event_id() -> int:
+        session = db_session.create_session()
+        event_id = session.execute(select(func.max(TaskEvent.id))).scalar()
+        session.close()
+        return event_id or 0
+
+    async def process_task_events(self, context: ContextTypes.DEFAULT_TYPE) -> None:
+        session = db_session.create_session()
+        events = session.execute(select(TaskEvent.id, TaskEvent.task_id, TaskEvent.action)
+                                 .where(TaskEvent.id > self._last_event_id).order_by(TaskEvent.id)).all()
+        owned = [(task_id, action) for _, task_id, action in events if self.owns(task_id)]
+        added_ids = {task_id for task_id, action in owned if action == "add"}
+        tasks = session.execute(select(Task).where(Task.id.in_(added_ids))).scalars().all() if added_ids else []
+        session.close()
+        if not events:
+            return
+        self._last_event_id = events[-1][0]
+        tasks = {task.id: task for task in tasks}
+        for task_id, action in owned:
+            if action == "add" and task_id in tasks:
+                self._cache_task(tasks[task_id])
+                self.schedule_task(tasks[task_id])
+            elif action == "remove":
+                self.scheduler.remove(task_id)
+                self._uncache_task(task_id)
+        logger.debug(f"Processed {len(owned)} task events on shard {self.shard}")
+
+    def resume_user(self, user_id: int) -> None:
+        for task in self.get_tasks(user_id):
+            self.schedule_task(task)
+
+    def suspend_users(self, user_ids: List[int]) -> None:
+        self.unschedule_tasks([task_id for user_id in user_ids for task_id in self._user_tasks.get(user_id, dict())])
+
+    async def sweep_subscriptions(self, context: ContextTypes.DEFAULT_TYPE | None = None) -> List[int]:
         now = datetime.now().timestamp()
         session = db_session.create_session()
-        users = session.execute(select(User).where(User.subscription_till > now)).scalars().all()
+        user_ids = session.execute(select(User.id).where(User.subscription_till > self._last_sweep,
+                                                         User.subscription_till <= now)).scalars().all()
         session.close()
-        return list(users)
+        self._last_sweep = now
+        if not user_ids:
+            return []
+        self.suspend_users(user_ids)
+        await self.subscription_end(user_ids)
+        logger.info(f"Suspended {len(user_ids)} expired subscriptions")
+        return user_ids
 
-    @staticmethod
-    def add_subscription_time(user_id: int, days: int) -> datetime:
+    def warm_start(self) -> None:
+        started = time.perf_counter()
+        active_tasks = self.load_cache()
+        loaded = time.perf_counter()
+        overdue = 0
+        if self.polling:
+            active_tasks = [task for task in active_tasks if self.owns(task.id)]
+            overdue = self.scheduler.add_many(map(self.make_poll_job, active_tasks))
+        scheduled = time.perf_counter()
+        logger.info(f"Warm start: loaded {len(self._subscriptions)} users and {len(self._tasks)} tasks in "
+                    f"{loaded - started:.3f}s, scheduled {len(active_tasks)} tasks in {scheduled - loaded:.3f}s, "
+                    f"{overdue} overdue")
+
+    async def save_poll_state(self, context: ContextTypes.DEFAULT_TYPE | None = None) -> None:
+        rows = []
+        for job in self.scheduler.dirty_jobs():
+            task = self._tasks.get(job.task_id)
+            if task is None:
+                continue
+            task.last_run_at = job.last_run
+            task.next_due_at = job.due
+            rows.append({"task_id": task.id, "run_at": task.last_run_at, "due_at": task.next_due_at,
+                         "fingerprint": task.page_fingerprint})
+        if not rows:
+            return
+        table = Task.__table__
+        statement = update(table).where(table.c.id == bindparam("task_id")).values(
+            last_run_at=bindparam("run_at"), next_due_at=bindparam("due_at"),
+            page_fingerprint=bindparam("fingerprint"))
         session = db_session.create_session()
-        user = session.execute(select(User).where(User.id == user_id)).scalar()
-        if not user:
+        try:
+            session.execute(statement, rows)
+            session.commit()
+        finally:
             session.close()
-            raise KeyError("No such user")
-        subscription_till = max(datetime.fromtimestamp(user.subscription_till), datetime.now()) + timedelta(days)
+        self.scheduler.mark_clean(row["task_id"] for row in rows)
+        logger.debug(f"Saved poll state of {len(rows)} tasks")
+
+    def load_cache(self) -> List[Task]:
+        now = datetime.now().timestamp()
+        session = db_session.create_session()
+        users = session.execute(select(User.id, User.subscription_till)).all()
+        query = select(Task, User.subscription_till).outerjoin(User, User.id == Task.user_id)
+        if self.shard is not None:
+            query = query.where(Task.id % poller_shards == self.shard)
+        rows = session.execute(query.order_by(Task.id)).all()
+        session.close()
+        self._subscriptions = {user_id: datetime.fromtimestamp(subscription_till)
+                               for user_id, subscription_till in users}
+        self._tasks = dict()
+        self._user_tasks = dict()
+        active_tasks = []
+        for task, subscription_till in rows:
+            self._cache_task(task)
+            if subscription_till is not None and subscription_till > now:
+                active_tasks.append(task)
+        logger.debug(f"Cached {len(self._subscriptions)} users and {len(self._tasks)} tasks")
+        return active_tasks
+
+    def _cache_task(self, task: Task) -> None:
+        self._tasks[task.id] = task
+        self._user_tasks.setdefault(task.user_id, dict())[task.id] = task
+
+    def _uncache_task(self, task_id: int) -> Task | None:
+        task = self._tasks.pop(task_id, None)
+        if task is not None:
+            self._user_tasks.get(task.user_id, dict()).pop(task_id, None)
+        return task
+
+    @traced
+    def new_user(self, user_id: int) -> datetime:
+        if user_id in self._subscriptions:
+            raise KeyError("User already exists")
+        session = db_session.create_session()
+        user = User()
+        user.id = user_id
+        subscription_till = datetime.now() + timedelta(free_subscription)
         user.subscription_till = subscription_till.timestamp()
+        session.add(user)
         session.commit()
         session.close()
+        self._subscriptions[user_id] = subscription_till
         return subscription_till
 
-    @staticmethod
-    def get_subscription_time(user_id: int) -> datetime:
+    @traced
+    def add_subscription_time(self, user_id: int, days: int) -> datetime:
+        if user_id not in self._subscriptions:
+            raise KeyError("No such user")
+        subscription_till = max(self._subscriptions[user_id], datetime.now()) + timedelta(days)
         session = db_session.create_session()
-        user = session.execute(select(User).where(User.id == user_id)).scalar()
+        session.execute(update(User).where(User.id == user_id).values(subscription_till=subscription_till.timestamp()))
+        session.commit()
         session.close()
-        if not user:
-            raise KeyError("No such user")
-        subscription_till = datetime.fromtimestamp(user.subscription_till)
+        self._subscriptions[user_id] = subscription_till
         return subscription_till
 
-    def add_task(self, user_id: int, name: str, url: str, frequency: int) -> int:
+    def get_subscription_time(self, user_id: int) -> datetime:
+        if user_id not in self._subscriptions:
+            raise KeyError("No such user")
+        return self._subscriptions[user_id]
+
+    @traced
+    async def add_task(self, user_id: int, name: str, url: str, frequency: int) -> int:
         logger.debug("Adding task")
-        items = self.get_last_k_items(url)
+        items = await self.get_last_k_items(url)
         if not items:
             raise KeyError("No items")
         session = db_session.create_session()
         task = Task()
         task.user_id = user_id
         task.name = name
-        task.url = url
+        task.url = urls.canonical_url(url)
         task.frequency = frequency
-        task.last_items = ';'.join(map(lambda x: str(x.id), items))
         session.add(task)
         session.commit()
         session.close()
+        self.add_seen_items(task.id, map(lambda x: x.id, items))
+        self._cache_task(task)
         return task.id
 
+    def get_tasks(self, user_id: int) -> List[Task]:
+        return list(self._user_tasks.get(user_id, dict()).values())
+
+    def count_tasks(self, user_id: int) -> int:
+        return len(self._user_tasks.get(user_id, dict()))
+
+    def get_task_page(self, user_id: int, page: int, page_size: int) -> List[Tuple[int, str]]:
+        tasks = self._user_tasks.get(user_id, dict()).values()
+        return [(task.id, task.name) for task in islice(tasks, page * page_size, (page + 1) * page_size)]
+
+    def get_task(self, task_id: int) -> Task | None:
+        return self._tasks.get(task_id)
+
+    @traced
+    def remove_task(self, task_id: int) -> None:
+        if self._uncache_task(task_id) is None:
+            return
+        session = db_session.create_session()
+        session.execute(delete(Task).where(Task.id == task_id))
+        session.execute(delete(SeenItem).where(SeenItem.task_id == task_id))
+        session.commit()
+        session.close()
+
+    @staticmethod
+    def get_listing_params(url: str) -> Tuple[str, Dict[str, Any]] | None:
+        if not urls.is_listing_url(url):
+            raise KeyError()
+        link, params = urls.parse_url(url)
+        if link.endswith("/") and not params:
+            return None
+        return urls.crawl_url(url), {'sorting': 'bumped_at desc', 'items_view': 'list', 'page': 1}
+
+    async def iter_pages(self, url: str, number_of_items: int = 72) -> AsyncIterator[List[Item]]:
+        listing = self.get_listing_params(url)
+        if listing is None:
+            return
+        link, params = listing
+        count = 0
+        while count < number_of_items:
+            url = urls.page_url(link, params)
+            with span("page", url=url, page=params['page']):
+                page_items = await self.page_cache.get(url, self.fetch_page_items)
+            if not page_items:
+                return
+            yield page_items[:number_of_items - count]
+            count += len(page_items)
+            params['page'] += 1
+
+    async def iter_items(self, url: str, number_of_items: int = 72) -> AsyncIterator[Item]:
+        async for page_items in self.iter_pages(url, number_of_items):
+            for item in page_items:
+                yield item
+
+    @traced
+    async def get_last_k_items(self, url: str, number_of_items: int = 72) -> List[Item] | None:
+        if self.get_listing_params(url) is None:
+            return None
+        return [item async for item in self.iter_items(url, number_of_items)]
+
+    @traced
+    async def fetch_page_items(self, url: str) -> List[Item]:
+        previous = self.page_cache.peek(url)
+        text = await self.fetcher.get(url, conditional=previous is not None)
+        if text is None:
+            return previous
+        return await self.parse_items(text)
+
+    @traced
+    async def parse_items(self, text: str) -> List[Item]:
+        with metrics.PARSE_SECONDS.time():
+            if self.parse_pool is None:
+                items = self.extract_items(text)
+            else:
+                rows = await asyncio.get_running_loop().run_in_executor(self.parse_pool, extract_item_tuples, text,
+                                                                        html_extractor)
+                items = [Item(*row) for row in rows]
+        metrics.PARSED_ITEMS.inc(len(items))
+        return items
+
+    @traced
+    async def get_new_items(self, task_id: int) -> NewItems | None:
+        task = self.get_task(task_id)
+        if task is None:
+            return None
+        if not self.has_seen_items(task_id):
+            await self.seed_seen_items(task)
+            return None
+        new_items = dict()
+        found_seen = False
+        fingerprint = None
+        async for page_items in self.iter_pages(task.url):
+            if not new_items and fingerprint is None:
+                link, params = self.get_listing_params(task.url)
+                fingerprint = self.fetcher.fingerprint(urls.page_url(link, params))
+                if fingerprint is not None and fingerprint == task.page_fingerprint:
+                    self.touch_seen_items(task_id, map(lambda x: x.id, page_items))
+                    return None
+            with metrics.SEEN_DIFF_SECONDS.time():
+                seen_ids = self.get_seen_item_ids(task_id, map(lambda x: x.id, page_items))
+            self.touch_seen_items(task_id, seen_ids)
+            for item in page_items:
+                if item.id in seen_ids:
+                    found_seen = True
+                    break
+                new_items.setdefault(item.id, item)
+            if found_seen:
+                break
+        if not new_items:
+            task.page_fingerprint = fingerprint
+            return None
+        listing_filter = urls.listing_filter(task.url)
+        items = [item for item in new_items.values() if listing_filter.matches(item)]
+        if items and self.enricher is not None:
+            await self.enricher.enrich(items)
+        return NewItems(task_id, list(new_items.keys()), items, fingerprint)
+
+    @traced
+    def record_new_items(self, new_items: NewItems, user_id: int, task_name: str, texts: Iterable[str]) -> None:
+        now = int(datetime.now().timestamp())
+        seen_rows = [{"task_id": new_items.task_id, "item_id": item_id, "first_seen": now, "last_seen": now}
+                     for item_id in set(new_items.item_ids)]
+        outbox_rows = [{"user_id": user_id, "task_id": new_items.task_id, "task_name": task_name, "text": text,
+                        "created_at": now, "attempts": 0, "next_attempt": now} for text in texts]
+        session = db_session.create_session()
+        try:
+            if seen_rows:
+                session.execute(insert(SeenItem).prefix_with("OR IGNORE"), seen_rows)
+            if outbox_rows:
+                session.execute(insert(OutboxMessage), outbox_rows)
+            session.commit()
+        finally:
+            session.close()
+        task = self.get_task(new_items.task_id)
+        if task is not None:
+            task.page_fingerprint = new_items.fingerprint
+
     @staticmethod
-    def get_tasks(user_id: int) -> List[Task]:
+    @traced
+    def enqueue_service_messages(user_ids: Iterable[int], text: str) -> None:
+        now = int(datetime.now().timestamp())
+        rows = [{"user_id": user_id, "task_id": None, "task_name": None, "text": text, "created_at": now,
+                 "attempts": 0, "next_attempt": now} for user_id in user_ids]
+        if not rows:
+            return
         session = db_session.create_session()
-        tasks = session.execute(select(Task).where(Task.user_id == user_id)).scalars().all()
+        session.execute(insert(OutboxMessage), rows)
+        session.commit()
         session.close()
-        return list(tasks)
+
+    @traced
+    def get_pending_notifications(self, now: int, limit: int) -> List[OutboxMessage]:
+        query = select(OutboxMessage).where(OutboxMessage.next_attempt <= now)
+        if self.shard is not None:
+            query = query.where(OutboxMessage.task_id % poller_shards == self.shard)
+        elif poller_shards:
+            query = query.where(OutboxMessage.task_id.is_(None))
+        session = db_session.create_session()
+        messages = session.execute(query.order_by(OutboxMessage.id).limit(limit)).scalars().all()
+        session.close()
+        return list(messages)
 
     @staticmethod
-    def get_all_tasks() -> List[Task]:
+    @traced
+    def delete_notifications(message_ids: List[int]) -> None:
         session = db_session.create_session()
-        tasks = session.execute(select(Task)).scalars().all()
+        session.execute(delete(OutboxMessage).where(OutboxMessage.id.in_(message_ids)))
+        session.commit()
         session.close()
-        return list(tasks)
 
     @staticmethod
-    def get_task(task_id: int) -> Task | None:
+    @traced
+    def postpone_notifications(message_ids: List[int], delay: float, attempts: int | None = None) -> None:
+        values = {"next_attempt": int(datetime.now().timestamp() + delay)}
+        if attempts is not None:
+            values["attempts"] = attempts
         session = db_session.create_session()
-        task = session.execute(select(Task).where(Task.id == task_id)).scalar()
+        session.execute(update(OutboxMessage).where(OutboxMessage.id.in_(message_ids)).values(**values))
+        session.commit()
         session.close()
-        return task
+
+    @traced
+    async def seed_seen_items(self, task: Task) -> None:
+        items = await self.get_last_k_items(task.url)
+        if items:
+            self.add_seen_items(task.id, map(lambda x: x.id, items))
+        logger.debug(f"Seeded seen items for task {task.id}")
 
     @staticmethod
-    def remove_task(task_id: int) -> None:
+    @traced
+    def has_seen_items(task_id: int) -> bool:
         session = db_session.create_session()
-        task = session.execute(select(Task).where(Task.id == task_id)).scalar()
-        if not task:
-            session.close()
+        item_id = session.execute(select(SeenItem.item_id).where(SeenItem.task_id == task_id).limit(1)).scalar()
+        session.close()
+        return item_id is not None
+
+    @staticmethod
+    @traced
+    def get_seen_item_ids(task_id: int, item_ids: Iterable[int]) -> Set[int]:
+        session = db_session.create_session()
+        seen_ids = session.execute(select(SeenItem.item_id).where(SeenItem.task_id == task_id,
+                                                                  SeenItem.item_id.in_(list(item_ids)))).scalars()
+        seen_ids = set(seen_ids)
+        session.close()
+        return seen_ids
+
+    @staticmethod
+    @traced
+    def add_seen_items(task_id: int, item_ids: Iterable[int]) -> None:
+        now = int(datetime.now().timestamp())
+        rows = [{"task_id": task_id, "item_id": item_id, "first_seen": now, "last_seen": now}
+                for item_id in set(item_ids)]
+        if not rows:
             return
-        session.delete(task)
+        session = db_session.create_session()
+        session.execute(insert(SeenItem).prefix_with("OR IGNORE"), rows)
         session.commit()
         session.close()
 
     @staticmethod
-    def get_last_k_items(url: str, number_of_items: int = 72) -> List[Item] | None:
-        if "bina.az" not in url:
-            raise KeyError()
-        _, _, args = url.partition("bina.az")
-        if not args or len(args) < 2:
-            return None
-        params = dict()
-        try:
-            link, _, params_str = url.partition('?')
-            for param in params_str.split('&'):
-                key, value = param.split('=')
-                params[key] = value
-        except ValueError:
-            link = url
-        params['sorting'] = 'bumped_at+desc'
-        params['items_view'] = 'list'
-        params['page'] = 1
-        items = []
-        while len(items) < number_of_items:
-            url = link + '?' + '&'.join([key + '=' + str(value) for key, value in params.items()])
-            r = requests.get(
-                url,
-                headers={
-                    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64; rv:66.0) Gecko/20100101 Firefox/66.0"
-                }
-            )
-            soup = bs4.BeautifulSoup(r.text, features="html.parser")
-            data = soup.find_all("div", {"class": "items-i"}, limit=(number_of_items - len(items)) + 4)[4:]
-            if not data:
-                return items[:number_of_items]
-            for page in data:
-                price = page.find("div", class_="price").text.strip()
-                place = page.find("div", class_="location").text.strip()
-                try:
-                    id = int(page.find("a", class_="item_link")['href'].split('/')[-1])
-                except Exception as e:
-                    print(e)
-                    continue
-                items.append(Item(id, price, place))
-            params['page'] += 1
-        return items[:number_of_items]
+    @traced
+    def touch_seen_items(task_id: int, item_ids: Iterable[int]) -> None:
+        item_ids = list(item_ids)
+        if not item_ids:
+            return
+        session = db_session.create_session()
+        session.execute(update(SeenItem).where(SeenItem.task_id == task_id, SeenItem.item_id.in_(item_ids))
+                        .values(last_seen=int(datetime.now().timestamp())))
+        session.commit()
+        session.close()
 
-    def get_new_items(self, task_id: int) -> List[Item] | None:
+    @staticmethod
+    async def prune_seen_items(context: ContextTypes.DEFAULT_TYPE) -> None:
+        threshold = int((datetime.now() - timedelta(seen_items_retention_days)).timestamp())
         session = db_session.create_session()
-        task = session.execute(select(Task).where(Task.id == task_id)).scalar()
-        if task is None:
-            session.close()
-            return None
-        previous_item_ids = list(map(int, task.last_items.split(';')))
-        last_items = self.get_last_k_items(task.url)
-        if not last_items:
-            session.close()
-            return None
-        new_items = []
-        for item in last_items:
-            if item.id in previous_item_ids:
-                break
-            new_items.append(item)
-        if not new_items:
-            session.close()
-            return None
-        all_ids = set(previous_item_ids) | set(map(lambda x: x.id, last_items))
-        task.last_items = ';'.join(map(lambda x: str(x), all_ids))
+        result = session.execute(delete(SeenItem).where(SeenItem.last_seen < threshold))
+        events_threshold = int((datetime.now() - timedelta(hours=task_events_retention_hours)).timestamp())
+        session.execute(delete(TaskEvent).where(TaskEvent.created_at < events_threshold))
+        session.commit()
+        session.close()
+        logger.debug(f"Pruned {result.rowcount} seen items")
+
+    def migrate_last_items(self) -> None:
+        session = db_session.create_session()
+        tasks = session.execute(select(Task).where(Task.last_items.is_not(None))).scalars().all()
+        for task in tasks:
+            if task.last_items:
+                self.add_seen_items(task.id, map(int, task.last_items.split(';')))
+            task.last_items = None
         session.commit()
         session.close()
-        return new_items
+        if tasks:
+            logger.info(f"Migrated last items of {len(tasks)} tasks to seen items")
+
+    async def close(self) -> None:
+        try:
+            if self.polling:
+                await self.save_poll_state()
+        except Exception as e:
+            logger.error("Failed to save poll state on shutdown", exc_info=e)
+        await self.fetcher.close()
+        if self.parse_pool is not None:
+            self.parse_pool.shutdown(wait=False, cancel_futures=True)
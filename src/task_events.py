@@ -0,0 +1,14 @@
+import sqlalchemy
+from sqlalchemy_serializer import SerializerMixin
+
+from src.db_session import SqlAlchemyBase
+
+
+class TaskEvent(SqlAlchemyBase, SerializerMixin):
+    __tablename__ = 'task_event'
+    __table_args__ = {'extend_existing': True}
+
+    id = sqlalchemy.Column(sqlalchemy.Integer, primary_key=True, autoincrement=True)
+    task_id = sqlalchemy.Column(sqlalchemy.Integer)
+    action = sqlalchemy.Column(sqlalchemy.String)
+    created_at = sqlalchemy.Column(sqlalchemy.Integer, index=True)
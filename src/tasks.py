@@ -7,8 +7,11 @@ class Task(SqlAlchemyBase, SerializerMixin):
     __tablename__ = 'task'
     __table_args__ = {'extend_existing': True}
     id = sqlalchemy.Column(sqlalchemy.Integer, primary_key=True, autoincrement=True)
-    user_id = sqlalchemy.Column(sqlalchemy.Integer)
+    user_id = sqlalchemy.Column(sqlalchemy.Integer, index=True)
     name = sqlalchemy.Column(sqlalchemy.String)
     url = sqlalchemy.Column(sqlalchemy.String)
     frequency = sqlalchemy.Column(sqlalchemy.Integer)
     last_items = sqlalchemy.Column(sqlalchemy.String)
+    last_run_at = sqlalchemy.Column(sqlalchemy.Float)
+    next_due_at = sqlalchemy.Column(sqlalchemy.Float)
+    page_fingerprint = sqlalchemy.Column(sqlalchemy.String)
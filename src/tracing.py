@@ -0,0 +1,122 @@
+import cProfile
+import functools
+import inspect
+import io
+import logging
+import pstats
+import time
+from contextlib import contextmanager, asynccontextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Callable
+
+from src.config import tracing_enabled, tracing_profile, slow_job_threshold
+
+slow_logger = logging.getLogger("slow_jobs")
+
+TRACED_ARGUMENTS = ("task_id", "user_id", "url")
+
+
+@dataclass
+class Span:
+    name: str
+    tags: Dict[str, Any]
+    depth: int
+    start: float
+    duration: float = 0.0
+
+
+@dataclass
+class JobTrace:
+    name: str
+    tags: Dict[str, Any]
+    start: float = field(default_factory=time.perf_counter)
+    spans: List[Span] = field(default_factory=list)
+
+    def format(self, duration: float) -> str:
+        tags = ' '.join(f"{key}={value}" for key, value in self.tags.items())
+        lines = [f"Slow job {self.name} {tags} took {duration:.3f}s"]
+        for span in self.spans:
+            tags = ' '.join(f"{key}={value}" for key, value in span.tags.items())
+            lines.append(f"{'  ' * (span.depth + 1)}+{span.start - self.start:.3f}s {span.name} "
+                         f"{span.duration:.3f}s {tags}".rstrip())
+        return '\n'.join(lines)
+
+
+_trace: ContextVar[JobTrace | None] = ContextVar("trace", default=None)
+_depth: ContextVar[int] = ContextVar("depth", default=0)
+_profiling = False
+
+
+@contextmanager
+def span(name: str, **tags):
+    trace = _trace.get()
+    if trace is None:
+        yield
+        return
+    depth = _depth.get()
+    current = Span(name, tags, depth, time.perf_counter())
+    trace.spans.append(current)
+    token = _depth.set(depth + 1)
+    try:
+        yield
+    finally:
+        _depth.reset(token)
+        current.duration = time.perf_counter() - current.start
+
+
+def traced(func: Callable) -> Callable:
+    signature = inspect.signature(func)
+    tagged = [name for name in TRACED_ARGUMENTS if name in signature.parameters]
+
+    def tags_of(args, kwargs) -> Dict[str, Any]:
+        if not tagged:
+            return dict()
+        bound = signature.bind_partial(*args, **kwargs).arguments
+        return {name: bound[name] for name in tagged if name in bound}
+
+    if inspect.iscoroutinefunction(func):
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            if _trace.get() is None:
+                return await func(*args, **kwargs)
+            with span(func.__qualname__, **tags_of(args, kwargs)):
+                return await func(*args, **kwargs)
+    else:
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if _trace.get() is None:
+                return func(*args, **kwargs)
+            with span(func.__qualname__, **tags_of(args, kwargs)):
+                return func(*args, **kwargs)
+    return wrapper
+
+
+@asynccontextmanager
+async def trace_job(name: str, **tags):
+    global _profiling
+    if not tracing_enabled:
+        yield
+        return
+    trace = JobTrace(name, tags)
+    token = _trace.set(trace)
+    profile = None
+    if tracing_profile and not _profiling:
+        _profiling = True
+        profile = cProfile.Profile()
+        profile.enable()
+    try:
+        yield
+    finally:
+        if profile is not None:
+            profile.disable()
+            _profiling = False
+        _trace.reset(token)
+        duration = time.perf_counter() - trace.start
+        if duration >= slow_job_threshold:
+            report = trace.format(duration)
+            if profile is not None:
+                stream = io.StringIO()
+                pstats.Stats(profile, stream=stream).sort_stats("cumulative").print_stats(30)
+                report += '\n' + stream.getvalue()
+            slow_logger.warning(report)
@@ -0,0 +1,76 @@
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Tuple, Dict, Any
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+
+from src.items import Item
+
+LISTING_HOST = "bina.az"
+PAGING_PARAMS = frozenset({"page", "sorting", "items_view"})
+LOCAL_PARAMS = frozenset({"price_from", "price_to"})
+
+Params = Tuple[Tuple[str, str], ...]
+
+
+@dataclass(frozen=True)
+class ListingFilter:
+    price_from: float | None = None
+    price_to: float | None = None
+
+    def matches(self, item: Item) -> bool:
+        if self.price_from is None and self.price_to is None:
+            return True
+        if item.price_value is None:
+            return False
+        if self.price_from is not None and item.price_value < self.price_from:
+            return False
+        return self.price_to is None or item.price_value <= self.price_to
+
+
+def _to_number(value: str | None) -> float | None:
+    if value is None:
+        return None
+    try:
+        return float(value.replace(" ", ""))
+    except ValueError:
+        return None
+
+
+def _encode(link: str, params: Params) -> str:
+    return link + ("?" + urlencode(params, safe="[]") if params else "")
+
+
+@lru_cache(maxsize=4096)
+def parse_url(url: str) -> Tuple[str, Params]:
+    url = url.strip()
+    parts = urlsplit(url if "//" in url else "//" + url)
+    host = (parts.hostname or "").lower().removeprefix("www.")
+    link = urlunsplit(((parts.scheme or "https").lower(), host, parts.path.rstrip("/") or "/", "", ""))
+    params = tuple(sorted({(key, value) for key, value in parse_qsl(parts.query)
+                           if value and key not in PAGING_PARAMS}))
+    return link, params
+
+
+def is_listing_url(url: str) -> bool:
+    host = urlsplit(parse_url(url)[0]).hostname or ""
+    return host == LISTING_HOST or host.endswith("." + LISTING_HOST)
+
+
+def canonical_url(url: str) -> str:
+    return _encode(*parse_url(url))
+
+
+def crawl_url(url: str) -> str:
+    link, params = parse_url(url)
+    return _encode(link, tuple((key, value) for key, value in params if key not in LOCAL_PARAMS))
+
+
+@lru_cache(maxsize=4096)
+def listing_filter(url: str) -> ListingFilter:
+    _, params = parse_url(url)
+    local = {key: value for key, value in params if key in LOCAL_PARAMS}
+    return ListingFilter(_to_number(local.get("price_from")), _to_number(local.get("price_to")))
+
+
+def page_url(link: str, params: Dict[str, Any]) -> str:
+    return link + ("&" if "?" in link else "?") + urlencode(params, safe="[]")
@@ -7,4 +7,4 @@ class User(SqlAlchemyBase, SerializerMixin):
     __tablename__ = 'user'
     __table_args__ = {'extend_existing': True}
     id = sqlalchemy.Column(sqlalchemy.Integer, primary_key=True)
-    subscription_till = sqlalchemy.Column(sqlalchemy.Integer)
+    subscription_till = sqlalchemy.Column(sqlalchemy.Integer, index=True)
@@ -0,0 +1,26 @@
+import unittest
+from pathlib import Path
+
+from src.extractors import EXTRACTORS, extract_items_soup
+
+FIXTURE = Path(__file__).resolve().parent.parent / "bench/fixtures/listing.html"
+
+
+class ExtractorsTest(unittest.TestCase):
+    def test_backends_return_same_items(self):
+        text = FIXTURE.read_text(encoding="utf-8")
+        expected = extract_items_soup(text)
+        self.assertTrue(expected)
+        for name, extract in EXTRACTORS.items():
+            with self.subTest(extractor=name):
+                self.assertEqual(extract(text), expected)
+
+    def test_card_text_is_normalised(self):
+        item = extract_items_soup(FIXTURE.read_text(encoding="utf-8"))[0]
+        self.assertEqual(item.price, "331 500 AZN")
+        self.assertEqual(item.price_value, 331500)
+        self.assertEqual(item.currency, "AZN")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,32 @@
+import unittest
+
+from src import urls
+from src.extractors import _make_item
+from src.items import Item
+
+LISTING_URL = "https://ru.bina.az/baki/alqi-satqi/menziller?price_to=200000&room_ids[]=1&room_ids[]=2&price_from=50000"
+
+
+class ListingUrlsTest(unittest.TestCase):
+    def test_crawl_url_keeps_room_filter(self):
+        self.assertEqual(urls.crawl_url(LISTING_URL),
+                         "https://ru.bina.az/baki/alqi-satqi/menziller?room_ids[]=1&room_ids[]=2")
+
+    def test_listing_filter_matches_price(self):
+        listing_filter = urls.listing_filter(LISTING_URL)
+        self.assertTrue(listing_filter.matches(Item(1, "120 000 AZN", "", 120000, "AZN")))
+        self.assertFalse(listing_filter.matches(Item(2, "40 000 AZN", "", 40000, "AZN")))
+        self.assertFalse(listing_filter.matches(Item(3, "250 000 AZN", "", 250000, "AZN")))
+
+    def test_listing_filter_rejects_unknown_price(self):
+        self.assertFalse(urls.listing_filter(LISTING_URL).matches(Item(1, "по договорённости", "")))
+        self.assertTrue(urls.listing_filter("https://bina.az/baki/menziller").matches(Item(1, "", "")))
+
+    def test_rooms_are_parsed_in_both_languages(self):
+        for name in ("3-otaqlı mənzil", "3-комн. квартира", "3-комнатная квартира"):
+            with self.subTest(name=name):
+                self.assertEqual(_make_item(1, "100 000 AZN", "", name).rooms, 3)
+
+
+if __name__ == "__main__":
+    unittest.main()